@@ -1,59 +1,54 @@
-from fastapi import FastAPI, Depends, HTTPException, Request, status, Path
-from fastapi.responses import StreamingResponse
-from fastapi.templating import Jinja2Templates
+from fastapi import FastAPI, Depends, HTTPException, Request, status, Path, Query
+from fastapi.responses import Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from typing import Dict, List, Optional
-from pymongo import MongoClient
+from pydantic import BaseModel, Field, ValidationError
+from typing import Dict, List, Literal, Optional
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import os
+import json
 from datetime import datetime, timezone, timedelta
+from contextlib import asynccontextmanager
 import secrets
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 
-from utils.symptoms import extract
-from utils.classification import classifyCondition
 from utils.recommender import bestPlant
-from utils.recipe import getRecipe
+from utils import recommender
+from utils.recipe import getRecipe, streamRecipe
+from utils import vertex, matcher, pipeline, cache, medicinal, pdf, mailer, metrics, pagination
+from database import mongo
 
 from dotenv import load_dotenv
 
-from weasyprint import HTML
-import io
-
-from auth.hashing import Hash
+from auth import hashing
 from auth.oauth import getCurrentUser
 from auth.jwttoken import createAccessToken
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-import requests
-from bs4 import BeautifulSoup
+import httpx
 load_dotenv()
 
-port = 8000
-client = MongoClient(os.getenv("MONGODB_URI"), port)
-db = client["User"]
-savedRecipes = db["saved_recipes"]
-pendingUsers = db["pending_users"] 
-
-savedRecipes.create_index(
-    [("deletedAt", 1)],
-    expireAfterSeconds=864000
-)
-
-pendingUsers.create_index(
-    [("verification_token_expires", 1)],
-    expireAfterSeconds=0
-)
-
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await mongo.connect()
+    vertex.startClient()
+    medicinal.startClient()
+    pdf.startPool()
+    mailer.start()
+    await recommender.startSnapshot()
+    yield
+    await recommender.stopSnapshot()
+    await mailer.stop()
+    pdf.stopPool()
+    hashing.stopExecutor()
+    await medicinal.closeClient()
+    await vertex.closeClient()
+    await mongo.close()
+
+app = FastAPI(lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="static"), name="static_files")
 
-templates = Jinja2Templates(directory="templates")
-
 origins = ["*"]
 
 app.add_middleware(
@@ -63,6 +58,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"]
 )
+app.add_middleware(metrics.RequestMetrics)
 
 class User(BaseModel):
     email: str
@@ -77,9 +73,6 @@ class Token(BaseModel):
     accessToken: str
     tokenType: str
 
-class TokenData(BaseModel):
-    username: Optional[str] = None
-
 class RecReq(BaseModel):
     medicalConcern: str
     edible: bool = False
@@ -100,6 +93,7 @@ class RecipeReq(BaseModel):
     plantName: str
     scientificName: str
     edibleUses: str
+    fresh: bool = False
 
 class RecipeData(BaseModel):
     recipeName: str
@@ -119,80 +113,11 @@ class EmailVerificationToken(BaseModel):
 def readRoot(currentUser: User = Depends(getCurrentUser)):
     return {"data": "Welcome to Elara"}
 
-def send_verification_email(email: str, username: str, token: str):
-    try:
-        smtp_server = os.getenv("SMTP_SERVER", "mail.privateemail.com")
-        smtp_port = int(os.getenv("SMTP_PORT", "465"))
-        smtp_login = os.getenv("SMTP_LOGIN", "edward@edwardgaibor.me")
-        smtp_username = "edward@edwardgaibor.me"
-        smtp_password = os.getenv("SMTP_PASSWORD")
-        
-        if not smtp_username or not smtp_password:
-            print("Warning: Email service not configured properly")
-            return False
-        
-        msg = MIMEMultipart()
-        msg['From'] = smtp_username
-        msg['To'] = email
-        msg['Subject'] = "Verify Your Elara Account"
-        
-        frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
-        verification_link = f"{frontend_url}/verify-email?token={token}&email={email}"
-        
-        print(f"\n=== SENDING VERIFICATION EMAIL ===")
-        print(f"To: {email}")
-        print(f"Username: {username}")
-        print(f"Frontend URL: {frontend_url}")
-        print(f"Token hash: {hash(token)}")
-        
-        body = f"""
-        <html>
-        <body>
-            <h2>Welcome to Elara, {username}!</h2>
-            <p>Thank you for registering with Elara. To complete your registration, please verify your email address by clicking the link below:</p>
-            <p><a href="{verification_link}" style="background-color: #059669; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px;">Verify Email Address</a></p>
-            <p>If the button doesn't work, you can copy and paste this link into your browser:</p>
-            <p>{verification_link}</p>
-            <p>This link will expire in 24 hours.</p>
-            <p>If you didn't create an account with Elara, please ignore this email.</p>
-            <br>
-            <p>Best regards,<br>The Elara Team</p>
-        </body>
-        </html>
-        """
-        
-        msg.attach(MIMEText(body, 'html'))
-        
-        server = smtplib.SMTP_SSL(smtp_server, smtp_port)
-        server.login(smtp_login, smtp_password)
-        text = msg.as_string()
-        server.sendmail(smtp_username, email, text)
-        server.quit()
-        
-        return True
-    except Exception as e:
-        print(f"Error sending email: {e}")
-        return False
-
 @app.post("/register")
-def createUser(request: User):
+async def createUser(request: User):
     try:
         print(f"Registration attempt for email: {request.email}, username: {request.username}")
         
-        existing_user = db["users"].find_one({"$or": [{"username": request.username}, {"email": request.email}]})
-        if existing_user:
-            if existing_user.get("email") == request.email:
-                raise HTTPException(status_code=400, detail="Email already registered")
-            else:
-                raise HTTPException(status_code=400, detail="Username already taken")
-        
-        existing_pending = pendingUsers.find_one({"$or": [{"username": request.username}, {"email": request.email}]})
-        if existing_pending:
-            if existing_pending.get("email") == request.email:
-                raise HTTPException(status_code=400, detail="Email already registered. Please check your email for verification instructions.")
-            else:
-                raise HTTPException(status_code=400, detail="Username already taken")
-        
         import re
         email_pattern = r'^[^\s@]+@[^\s@]+\.[^\s@]+$'
         if not re.match(email_pattern, request.email):
@@ -204,7 +129,27 @@ def createUser(request: User):
         if len(request.username) < 3:
             raise HTTPException(status_code=400, detail="Username must be at least 3 characters long")
         
-        hashedPassword = Hash.bcrypt(request.password)
+        # Unique indexes cannot span the two collections, so verified users
+        # are still looked up; duplicates among pending users surface as a
+        # DuplicateKeyError on the insert below.
+        existing_user = await mongo.users().find_one(
+            {"$or": [{"username": request.username}, {"email": request.email}]},
+            {"email": 1}
+        )
+        if existing_user:
+            if existing_user.get("email") == request.email:
+                raise HTTPException(status_code=400, detail="Email already registered")
+            else:
+                raise HTTPException(status_code=400, detail="Username already taken")
+        
+        try:
+            hashedPassword = await hashing.hashPassword(request.password)
+        except hashing.HashingBusy:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many sign-ups right now, please try again shortly",
+                headers={"Retry-After": "1"}
+            )
         verification_token = secrets.token_urlsafe(32)
         
         pendingUserObject = {
@@ -216,17 +161,26 @@ def createUser(request: User):
             "created_at": datetime.now(timezone.utc)
         }
         
-        pendingUserID = pendingUsers.insert_one(pendingUserObject)
-        print(f"Pending user created with ID: {pendingUserID.inserted_id}")
+        # The pending user and its verification email commit together, so a
+        # failed enqueue cannot leave an account nobody is ever mailed about.
+        # Delivery is the outbox worker's job; a slow or failing SMTP server
+        # is retried there instead of failing the registration.
+        async def register(session):
+            result = await mongo.pendingUsers().insert_one(pendingUserObject, session=session)
+            await mailer.enqueueVerification(request.email, request.username, verification_token, session=session)
+            return result.inserted_id
+
+        try:
+            async with mongo.startSession() as session:
+                pendingUserID = await session.with_transaction(register)
+        except DuplicateKeyError as e:
+            if "email" in (e.details or {}).get("keyPattern", {}):
+                raise HTTPException(status_code=400, detail="Email already registered. Please check your email for verification instructions.")
+            raise HTTPException(status_code=400, detail="Username already taken")
+        mailer.wake()
+        print(f"Pending user created with ID: {pendingUserID}")
         print(f"Verification token (first 10 chars): {verification_token[:10]}...")
 
-        email_sent = send_verification_email(request.email, request.username, verification_token)
-        
-        if not email_sent:
-            delete_result = pendingUsers.delete_one({"_id": pendingUserID.inserted_id})
-            print(f"Email failed for user {request.username}. Deletion result: {delete_result.deleted_count}")
-            raise HTTPException(status_code=500, detail="Failed to send verification email. Please try again.")
-        
         return {"message": "Registration successful! Please check your email and click the verification link to complete your account setup."}
         
     except HTTPException:
@@ -236,7 +190,7 @@ def createUser(request: User):
         raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
 
 @app.post("/verify-email")
-def verifyEmail(request: EmailVerificationToken, req: Request):
+async def verifyEmail(request: EmailVerificationToken, req: Request):
     print(f"\n=== VERIFY EMAIL ATTEMPT ===")
     print(f"Token received: {request.token[:10]}..." if request.token else "No token")
     print(f"Request headers: {dict(req.headers)}")
@@ -244,13 +198,34 @@ def verifyEmail(request: EmailVerificationToken, req: Request):
     print(f"User-Agent: {req.headers.get('user-agent', 'Unknown')}")
     print(f"Referer: {req.headers.get('referer', 'None')}")
     
-    pending_user = pendingUsers.find_one({
-        "verification_token": request.token,
-        "verification_token_expires": {"$gt": datetime.now(timezone.utc)}
-    })
+    # Claiming the pending user and creating the account commit together, so
+    # a token can only be redeemed once and a failed insert loses nothing.
+    async def promote(session):
+        pending_user = await mongo.pendingUsers().find_one_and_delete({
+            "verification_token": request.token,
+            "verification_token_expires": {"$gt": datetime.now(timezone.utc)}
+        }, session=session)
+        if not pending_user:
+            return None
+
+        await mongo.users().insert_one({
+            "email": pending_user["email"],
+            "username": pending_user["username"],
+            "password": pending_user["password"],
+            "email_verified": True,
+            "created_at": pending_user["created_at"],
+            "verified_at": datetime.now(timezone.utc)
+        }, session=session)
+        return pending_user
+
+    try:
+        async with mongo.startSession() as session:
+            pending_user = await session.with_transaction(promote)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="An account with this username or email already exists")
     
     if not pending_user:
-        expired_user = pendingUsers.find_one({"verification_token": request.token})
+        expired_user = await mongo.pendingUsers().find_one({"verification_token": request.token}, {"username": 1})
         if expired_user:
             print(f"Token expired for user: {expired_user.get('username')}")
             raise HTTPException(status_code=410, detail="Verification token has expired. Please register again.")
@@ -258,65 +233,26 @@ def verifyEmail(request: EmailVerificationToken, req: Request):
             print(f"Invalid token attempted: {request.token[:10]}...")
             raise HTTPException(status_code=400, detail="Invalid verification token")
     
-    print(f"Found pending user: {pending_user['username']} ({pending_user['email']})")
-    print(f"Token expires at: {pending_user['verification_token_expires']}")
-    
-    verified_user = {
-        "email": pending_user["email"],
-        "username": pending_user["username"],
-        "password": pending_user["password"],
-        "email_verified": True,
-        "created_at": pending_user["created_at"],
-        "verified_at": datetime.now(timezone.utc)
-    }
-    
-    user_result = db["users"].insert_one(verified_user)
-    
-    if user_result.inserted_id:
-        pendingUsers.delete_one({"_id": pending_user["_id"]})
-        print(f"User {pending_user['username']} successfully verified and moved to main collection")
-        print(f"=== VERIFY EMAIL SUCCESS ===\n")
-    else:
-        print(f"Failed to create verified user for: {pending_user['username']}")
-        raise HTTPException(status_code=500, detail="Failed to create verified user account")
+    print(f"User {pending_user['username']} successfully verified and moved to main collection")
+    print(f"=== VERIFY EMAIL SUCCESS ===\n")
     
     return {"message": "Email verified successfully! Your account is now active and you can log in."}
 
 @app.get("/plant/medicalUses/{latin_name}")
-def getMedicinalUses(latin_name: str, currentUser: User = Depends(getCurrentUser)):
-    # Construct URL, replacing spaces with '+'
-    base = "https://pfaf.org/user/Plant.aspx?LatinName="
-    url = base + latin_name.replace(" ", "+")
-    
-    # Fetch page
-    resp = requests.get(url, headers={"User-Agent": "python-requests"})
-    resp.raise_for_status()
-    
-    # Parse HTML
-    soup = BeautifulSoup(resp.text, "html.parser")
-    
-    # Primary selector: the span that holds the medicinal uses
-    span = soup.find("span", id="ContentPlaceHolder1_txtMediUses")
-    if span:
-        # Return plain text
-        return span.get_text(separator=" ", strip=True)
-    
-    # Fallback: find the <h2> titled "Medicinal Uses" and grab the next <div>
-    h2 = soup.find("h2", string=lambda t: t and "Medicinal Uses" in t)
-    if h2:
-        div = h2.find_next_sibling("div")
-        if div:
-            return div.get_text(separator=" ", strip=True)
-    
-    return "Medicinal Uses section not found."
+async def getMedicinalUses(latin_name: str, currentUser: User = Depends(getCurrentUser)):
+    try:
+        return await medicinal.getMedicinalUses(latin_name)
+    except httpx.HTTPError as e:
+        print(f"PFAF lookup failed for {latin_name}: {e}")
+        raise HTTPException(status_code=502, detail="Could not fetch medicinal uses from PFAF")
 
 @app.post("/get-email-for-username")
-def getEmailForUsername(request: Dict[str, str]):
+async def getEmailForUsername(request: Dict[str, str]):
     username = request.get("username")
     if not username:
         raise HTTPException(status_code=400, detail="Username is required")
     
-    pending_user = pendingUsers.find_one({"username": username})
+    pending_user = await mongo.pendingUsers().find_one({"username": username}, {"email": 1})
     if pending_user:
         email = pending_user["email"]
         parts = email.split("@")
@@ -329,41 +265,36 @@ def getEmailForUsername(request: Dict[str, str]):
     raise HTTPException(status_code=404, detail="Username not found")
 
 @app.post("/resend-verification")
-def resendVerification(request: EmailVerificationRequest):
-    pending_user = pendingUsers.find_one({"email": request.email})
-    main_user = db["users"].find_one({"email": request.email})
-    
-    if main_user and main_user.get("email_verified", False):
-        raise HTTPException(status_code=400, detail="Email already verified. You can log in now.")
-    
-    if not pending_user:
-        raise HTTPException(status_code=404, detail="No pending registration found for this email. Please register again.")
-    
+async def resendVerification(request: EmailVerificationRequest):
     verification_token = secrets.token_urlsafe(32)
     
-    pendingUsers.update_one(
-        {"_id": pending_user["_id"]},
+    pending_user = await mongo.pendingUsers().find_one_and_update(
+        {"email": request.email},
         {
             "$set": {
                 "verification_token": verification_token,
                 "verification_token_expires": datetime.now(timezone.utc) + timedelta(hours=24)
             }
-        }
+        },
+        projection={"username": 1}
     )
     
-    email_sent = send_verification_email(request.email, pending_user["username"], verification_token)
-    
-    if not email_sent:
-        raise HTTPException(status_code=500, detail="Failed to send verification email")
+    if not pending_user:
+        main_user = await mongo.users().find_one({"email": request.email}, {"email_verified": 1})
+        if main_user and main_user.get("email_verified", False):
+            raise HTTPException(status_code=400, detail="Email already verified. You can log in now.")
+        raise HTTPException(status_code=404, detail="No pending registration found for this email. Please register again.")
     
+    await mailer.enqueueVerification(request.email, pending_user["username"], verification_token)
+
     return {"message": "Verification email sent successfully"}
 
 @app.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = db["users"].find_one({"username": form_data.username})
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await mongo.users().find_one({"username": form_data.username})
 
     if not user:
-        pending_user = pendingUsers.find_one({"username": form_data.username})
+        pending_user = await mongo.pendingUsers().find_one({"username": form_data.username})
         if pending_user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -379,7 +310,7 @@ def login(form_data: OAuth2PasswordRequestForm = Depends()):
         print(f"WARNING: User {form_data.username} in main collection without email_verified=True")
         print(f"User data: {user}")
         
-        pending_user = pendingUsers.find_one({"username": form_data.username})
+        pending_user = await mongo.pendingUsers().find_one({"username": form_data.username})
         if pending_user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -391,70 +322,254 @@ def login(form_data: OAuth2PasswordRequestForm = Depends()):
                 detail="Account verification incomplete. Please contact support."
             )
     
-    if not Hash.verify(user["password"], form_data.password):
+    try:
+        valid, newHash = await hashing.verifyPassword(user["password"], form_data.password)
+    except hashing.HashingBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many logins right now, please try again shortly",
+            headers={"Retry-After": "1"}
+        )
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password :("
         )
+    if newHash:
+        # The cost factor changed since this hash was made; upgrade it now
+        # that we have the plaintext. Guarded so a concurrent change wins.
+        await mongo.users().update_one(
+            {"_id": user["_id"], "password": user["password"]},
+            {"$set": {"password": newHash}}
+        )
     
     accessToken = createAccessToken(data={"sub": user["username"]})
     return {"access_token": accessToken, "token_type": "bearer"}
 
 @app.post("/getRecommendations", response_model=RecResp)
 async def getRecommendations(req: RecReq, currentUser: User = Depends(getCurrentUser)):
-    rawSymptoms   = extract(req.medicalConcern)
-    symptoms_dict = rawSymptoms["symptoms"]
-
-    rawClasses = classifyCondition(symptoms_dict)
+    rawSymptoms, rawClasses = await pipeline.analyze(req.medicalConcern)
     classDict  = rawClasses["outputs"]
 
-    recs = bestPlant(classDict, edible=req.edible)
-
-    return {"output": recs}
+    with metrics.stage("recommend"):
+        recs = await bestPlant(classDict, edible=req.edible)
+
+    # Serialized here rather than by FastAPI so the cost shows up as a stage.
+    with metrics.stage("serialize"):
+        body = RecResp(output=recs).model_dump_json()
+    return Response(body, media_type="application/json")
+
+@app.post("/getRecommendations/stream")
+async def getRecommendationsStream(req: RecReq, currentUser: User = Depends(getCurrentUser)):
+    async def events():
+        try:
+            async for event, data in pipeline.analyzeStream(req.medicalConcern, edible=req.edible):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            print(f"Streaming recommendation failed: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': 'Recommendation failed'})}\n\n"
+
+    # no-cache and no proxy buffering, or events arrive all at once at the end.
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheusMetrics(request: Request):
+    # Scrapers rarely carry a user JWT; METRICS_TOKEN, when set, guards this instead.
+    token = os.getenv("METRICS_TOKEN")
+    if token and request.headers.get("authorization") != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    body, contentType = metrics.exposition()
+    return Response(body, media_type=contentType)
+
+@app.get("/stats/classifier")
+def classifierStats(currentUser: User = Depends(getCurrentUser)):
+    return matcher.rates()
+
+@app.get("/stats/email")
+async def emailStats(currentUser: User = Depends(getCurrentUser)):
+    return await mailer.report()
+
+@app.get("/stats/hashing")
+def hashingStats(currentUser: User = Depends(getCurrentUser)):
+    return hashing.report()
+
+@app.get("/stats/pdf")
+def pdfStats(currentUser: User = Depends(getCurrentUser)):
+    return pdf.report()
+
+@app.get("/stats/pipeline")
+def pipelineStats(currentUser: User = Depends(getCurrentUser)):
+    return pipeline.report()
+
+@app.get("/stats/cache")
+def cacheStats(currentUser: User = Depends(getCurrentUser)):
+    return cache.report()
+
+def validRecipe(recipe: dict) -> dict:
+    return RecipeResp.model_validate(recipe).model_dump()
 
 @app.post("/getRecipe", response_model = RecipeResp)
 async def recipe(req: RecipeReq, currentUser: User = Depends(getCurrentUser)):
-    recipeDict = getRecipe(
-        req.plantName,
-        req.scientificName,
-        req.edibleUses
-    )
+    try:
+        recipeDict = await getRecipe(
+            req.plantName,
+            req.scientificName,
+            req.edibleUses,
+            fresh=req.fresh,
+            validate=validRecipe
+        )
+    except (ValidationError, ValueError) as e:
+        print(f"Generated recipe was not a valid RecipeData: {e}")
+        raise HTTPException(status_code=502, detail="Recipe generation returned an invalid recipe")
 
     return recipeDict
 
+@app.post("/getRecipe/stream")
+async def recipeStream(req: RecipeReq, currentUser: User = Depends(getCurrentUser)):
+    async def events():
+        try:
+            async for event, data in streamRecipe(
+                req.plantName,
+                req.scientificName,
+                req.edibleUses,
+                fresh=req.fresh,
+                validate=validRecipe
+            ):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except (ValidationError, ValueError) as e:
+            print(f"Streamed recipe was not a valid RecipeData: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': 'Recipe generation returned an invalid recipe'})}\n\n"
+        except Exception as e:
+            print(f"Streaming recipe failed: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': 'Recipe generation failed'})}\n\n"
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
 class RecipeJSON(BaseModel):
     symptom: str
     recipeName: str
     ingredients: List[str]
     instructions: str
 
-@app.post("/saveRecipe")
-async def saveRecipe(payload: RecipeJSON, currentUser: User = Depends(getCurrentUser)):
-    doc = {
-        "userId": currentUser.username,
+BULK_LIMIT = int(os.getenv("RECIPE_BULK_LIMIT", "100"))
+
+class RecipeBatch(BaseModel):
+    recipes: List[RecipeJSON] = Field(..., min_length=1, max_length=BULK_LIMIT)
+
+class RecipeIds(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=BULK_LIMIT)
+
+def recipeDoc(payload: RecipeJSON, username: str, savedAt: datetime) -> dict:
+    return {
+        "userId": username,
         "symptom": payload.symptom,
         "recipe": {
             "recipeName": payload.recipeName,
             "ingredients": payload.ingredients,
             "instructions": payload.instructions
         },
-        "savedAt": datetime.now(timezone.utc)
+        "savedAt": savedAt
     }
 
-    result = savedRecipes.insert_one(doc)
+def toObjectId(recipe_id: str) -> Optional[ObjectId]:
+    try:
+        return ObjectId(recipe_id)
+    except (InvalidId, TypeError):
+        return None
+
+def stampNow() -> datetime:
+    # BSON dates hold milliseconds; truncate so the stamp compares equal
+    # once it has been written.
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+def parseIds(raw: List[str]) -> Dict[str, Optional[ObjectId]]:
+    # Request order, duplicates collapsed.
+    return {recipe_id: toObjectId(recipe_id) for recipe_id in raw}
+
+async def bulkTransition(ids: Dict[str, Optional[ObjectId]], query: dict, update: dict, stampField: str, stamp: datetime, done: str, missed: str):
+    # One update_many for the whole list. When every id matched that is the
+    # only round trip; otherwise the ids carrying this request's stamp are
+    # the ones it changed.
+    valid = list({oid for oid in ids.values() if oid is not None})
+    changed: set = set()
+    if valid:
+        result = await mongo.savedRecipes().update_many({"_id": {"$in": valid}, **query}, update)
+        if result.modified_count == len(valid):
+            changed = set(valid)
+        elif result.modified_count:
+            cursor = mongo.savedRecipes().find({"_id": {"$in": valid}, stampField: stamp}, {"_id": 1})
+            changed = {doc["_id"] async for doc in cursor}
+
+    results = []
+    for recipe_id, oid in ids.items():
+        if oid is None:
+            status_ = "invalid"
+        else:
+            status_ = done if oid in changed else missed
+        results.append({"id": recipe_id, "status": status_})
+    return results, len(changed)
+
+@app.post("/saveRecipe")
+async def saveRecipe(payload: RecipeJSON, currentUser: User = Depends(getCurrentUser)):
+    doc = recipeDoc(payload, currentUser.username, datetime.now(timezone.utc))
+
+    result = await mongo.savedRecipes().insert_one(doc)
     if not result.inserted_id:
         raise HTTPException(status_code=500, detail="Failed to save recipe.")
     return {"message": "Recipe saved successfully", "id": str(result.inserted_id)}
 
+@app.post("/saveRecipes")
+async def saveRecipes(payload: RecipeBatch, currentUser: User = Depends(getCurrentUser)):
+    savedAt = datetime.now(timezone.utc)
+    docs = [recipeDoc(recipe, currentUser.username, savedAt) for recipe in payload.recipes]
+
+    # insert_many fills in each doc's _id before sending, and unordered
+    # inserts keep going past a failed item.
+    failed = set()
+    try:
+        await mongo.savedRecipes().insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        failed = {err["index"] for err in e.details.get("writeErrors", [])}
+        print(f"Bulk save for {currentUser.username}: {len(failed)} of {len(docs)} failed")
+
+    results = [
+        {"status": "failed"} if i in failed else {"status": "saved", "id": str(doc["_id"])}
+        for i, doc in enumerate(docs)
+    ]
+    return {"results": results, "saved": len(docs) - len(failed)}
+
+PAGE_LIMIT_DEFAULT = int(os.getenv("PAGE_LIMIT_DEFAULT", "50"))
+PAGE_LIMIT_MAX = int(os.getenv("PAGE_LIMIT_MAX", "200"))
+
+async def recipePage(query: dict, sort: list, projection: dict, limit: int, after: Optional[str]):
+    try:
+        return await pagination.page(mongo.savedRecipes(), query, sort, projection, limit, after)
+    except pagination.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/getSavedRecipes")
-async def getSavedRecipes(currentUser: User = Depends(getCurrentUser)):
-    cursor = savedRecipes.find({
-        "userId": currentUser.username,
-        "deletedAt": {"$exists": False}
-    }).sort("savedAt", -1)
+async def getSavedRecipes(
+    limit: int = Query(PAGE_LIMIT_DEFAULT, ge=1, le=PAGE_LIMIT_MAX),
+    after: Optional[str] = None,
+    currentUser: User = Depends(getCurrentUser)
+):
+    # deletedAt: None (missing) rather than $exists: False, so the match is
+    # an index equality and the savedAt sort comes straight off the index.
+    docs, nextCursor = await recipePage(
+        {"userId": currentUser.username, "deletedAt": None},
+        [("savedAt", -1), ("_id", -1)],
+        {"symptom": 1, "recipe": 1, "savedAt": 1},
+        limit,
+        after
+    )
 
     saved_list = []
-    for doc in cursor:
+    for doc in docs:
         saved_list.append({
             "id": str(doc["_id"]),
             "symptom": doc.get("symptom"),
@@ -462,42 +577,53 @@ async def getSavedRecipes(currentUser: User = Depends(getCurrentUser)):
             "savedAt": doc["savedAt"].isoformat()
         })
 
-    return {"savedRecipes": saved_list}
+    return {"savedRecipes": saved_list, "next": nextCursor}
 
 @app.delete("/deleteRecipe/{recipe_id}")
 async def deleteRecipe(
     recipe_id: str = Path(..., description="ID of the recipe to delete"),
     currentUser: User = Depends(getCurrentUser)
 ):
-    doc = savedRecipes.find_one({
-        "_id": ObjectId(recipe_id),
-        "userId": currentUser.username,
-        "deletedAt": {"$exists": False}
-    })
+    doc = await mongo.savedRecipes().find_one_and_update(
+        {"_id": toObjectId(recipe_id), "userId": currentUser.username, "deletedAt": None},
+        {"$set": {"deletedAt": datetime.now(timezone.utc)}},
+        projection={"_id": 1}
+    )
 
     if not doc:
         raise HTTPException(status_code=404, detail="Recipe not found or already deleted")
 
-    result = savedRecipes.update_one(
-        {"_id": ObjectId(recipe_id)},
-        {"$set": {"deletedAt": datetime.now(timezone.utc)}}
-    )
-
-    if result.modified_count != 1:
-        raise HTTPException(status_code=500, detail="Failed to delete recipe")
-
     return {"message": "Recipe moved to Recently Deleted"}
 
+@app.post("/deleteRecipes")
+async def deleteRecipes(payload: RecipeIds, currentUser: User = Depends(getCurrentUser)):
+    now = stampNow()
+    results, count = await bulkTransition(
+        parseIds(payload.ids),
+        {"userId": currentUser.username, "deletedAt": None},
+        {"$set": {"deletedAt": now}},
+        "deletedAt", now,
+        "deleted", "notFound"
+    )
+    return {"results": results, "deleted": count}
+
 @app.get("/recentlyDeleted")
-async def getRecentlyDeleted(currentUser: User = Depends(getCurrentUser)):
+async def getRecentlyDeleted(
+    limit: int = Query(PAGE_LIMIT_DEFAULT, ge=1, le=PAGE_LIMIT_MAX),
+    after: Optional[str] = None,
+    currentUser: User = Depends(getCurrentUser)
+):
     ten_days_ago = datetime.now(timezone.utc) - timedelta(days=10)
-    cursor = savedRecipes.find({
-        "userId": currentUser.username,
-        "deletedAt": {"$exists": True, "$gte": ten_days_ago}
-    }).sort("deletedAt", -1)
+    docs, nextCursor = await recipePage(
+        {"userId": currentUser.username, "deletedAt": {"$gte": ten_days_ago}},
+        [("deletedAt", -1), ("savedAt", -1), ("_id", -1)],
+        {"symptom": 1, "recipe": 1, "deletedAt": 1, "savedAt": 1},
+        limit,
+        after
+    )
 
     deleted_list = []
-    for doc in cursor:
+    for doc in docs:
         deleted_list.append({
             "id": str(doc["_id"]),
             "symptom": doc.get("symptom"),
@@ -505,7 +631,7 @@ async def getRecentlyDeleted(currentUser: User = Depends(getCurrentUser)):
             "deletedAt": doc["deletedAt"].isoformat()
         })
 
-    return {"recentlyDeleted": deleted_list}
+    return {"recentlyDeleted": deleted_list, "next": nextCursor}
 
 
 @app.post("/recoverRecipe/{recipe_id}")
@@ -513,46 +639,89 @@ async def recoverRecipe(
     recipe_id: str,
     currentUser: User = Depends(getCurrentUser)
 ):
-    ten_days_ago = datetime.now(timezone.utc) - timedelta(days=10)
-    doc = savedRecipes.find_one({
-        "_id": ObjectId(recipe_id),
-        "userId": currentUser.username,
-        "deletedAt": {"$exists": True, "$gte": ten_days_ago}
-    })
+    now = datetime.now(timezone.utc)
+    doc = await mongo.savedRecipes().find_one_and_update(
+        {"_id": toObjectId(recipe_id), "userId": currentUser.username, "deletedAt": {"$gte": now - timedelta(days=10)}},
+        {"$unset": {"deletedAt": ""}, "$set": {"recoveredAt": now}},
+        projection={"_id": 1}
+    )
 
     if not doc:
         raise HTTPException(status_code=404, detail="Recipe not found or not recoverable")
 
-    result = savedRecipes.update_one(
-        {"_id": ObjectId(recipe_id)},
-        {"$unset": {"deletedAt": ""}}
-    )
-
-    if result.modified_count != 1:
-        raise HTTPException(status_code=500, detail="Failed to recover recipe")
-
     return {"message": "Recipe recovered successfully"}
 
+@app.post("/recoverRecipes")
+async def recoverRecipes(payload: RecipeIds, currentUser: User = Depends(getCurrentUser)):
+    # recoveredAt is the stamp that tells this request's recoveries apart
+    # from recipes that were never deleted.
+    now = stampNow()
+    results, count = await bulkTransition(
+        parseIds(payload.ids),
+        {"userId": currentUser.username, "deletedAt": {"$gte": now - timedelta(days=10)}},
+        {"$unset": {"deletedAt": ""}, "$set": {"recoveredAt": now}},
+        "recoveredAt", now,
+        "recovered", "notRecoverable"
+    )
+    return {"results": results, "recovered": count}
+
 @app.post("/downloadRecipePDF")
-async def downloadRecipePDF(request: Request, payload: RecipeJSON, currentUser: User = Depends(getCurrentUser)):
-    context = {
-    "request": request,
-    "recipe": {
+async def downloadRecipePDF(
+    request: Request,
+    payload: RecipeJSON,
+    engine: Optional[Literal["weasyprint", "fast"]] = None,
+    currentUser: User = Depends(getCurrentUser)
+):
+    recipe = {
         "title": payload.recipeName,
         "ingredients": payload.ingredients,
         "instructions": payload.instructions
-    },
-    "base_url": request.url_for("static_files", path=""),
     }
-    rendered_html = templates.get_template("recipe.html").render(context)
-
-    pdf_io = io.BytesIO()
-    HTML(string=rendered_html, base_url=str(request.base_url)).write_pdf(target=pdf_io)
-    pdf_io.seek(0)
+    try:
+        pdfBytes = await pdf.renderRecipe(recipe, engine)
+    except pdf.RendererBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="PDF renderer is busy, please try again shortly",
+            headers={"Retry-After": "2"}
+        )
 
     filename_safe = payload.recipeName.replace(" ", "_") + ".pdf"
     headers = {
         "Content-Disposition": f'attachment; filename="{filename_safe}"'
     }
     
-    return StreamingResponse(pdf_io, media_type="application/pdf", headers=headers)
\ No newline at end of file
+    return Response(pdfBytes, media_type="application/pdf", headers=headers)
+
+@app.get("/downloadCookbookPDF")
+async def downloadCookbookPDF(currentUser: User = Depends(getCurrentUser)):
+    # Same live-recipe match as /getSavedRecipes, so both the count and the
+    # savedAt-ordered scan run off the (userId, deletedAt, savedAt) index.
+    query = {"userId": currentUser.username, "deletedAt": None}
+    if await mongo.savedRecipes().count_documents(query, limit=1) == 0:
+        raise HTTPException(status_code=404, detail="No saved recipes to export")
+
+    async def recipes():
+        # Only the recipe body leaves Mongo; batches keep the cursor's buffer small.
+        cursor = mongo.savedRecipes().find(query, {"recipe": 1, "_id": 0}).sort([("savedAt", -1), ("_id", -1)]).batch_size(50)
+        async for doc in cursor:
+            recipe = doc["recipe"]
+            yield {
+                "title": recipe["recipeName"],
+                "ingredients": recipe["ingredients"],
+                "instructions": recipe["instructions"]
+            }
+
+    try:
+        chunks = pdf.renderCookbook(recipes(), title=f"{currentUser.username}'s Elara Cookbook")
+    except pdf.RendererBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="PDF renderer is busy, please try again shortly",
+            headers={"Retry-After": "2"}
+        )
+
+    headers = {
+        "Content-Disposition": 'attachment; filename="Elara_Cookbook.pdf"'
+    }
+    return StreamingResponse(chunks, media_type="application/pdf", headers=headers)
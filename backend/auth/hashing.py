@@ -1,9 +1,109 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from passlib.context import CryptContext
 
-pwdCxt = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Raising BCRYPT_ROUNDS upgrades existing hashes the next time each user logs in.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so a few dedicated threads give real parallelism
+# without borrowing from the threadpool every other sync route runs on.
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "4"))
+HASH_MAX_QUEUE = int(os.getenv("HASH_MAX_QUEUE", "32"))
+
+pwdCxt = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+stats = {
+    "inFlight": 0,
+    "hashed": 0,
+    "verified": 0,
+    "rehashed": 0,
+    "rejected": 0,
+    "hashSecondsTotal": 0.0,
+    "hashSecondsMax": 0.0,
+    "waitSecondsTotal": 0.0,
+}
+
+_executor: ThreadPoolExecutor | None = None
+
+
+class HashingBusy(Exception):
+    pass
+
 
 class Hash:
     def bcrypt(password: str):
         return pwdCxt.hash(password)
     def verify(hased, normal):
-        return pwdCxt.verify(normal, hased)
\ No newline at end of file
+        return pwdCxt.verify(normal, hased)
+    def verifyAndUpdate(hased, normal):
+        return pwdCxt.verify_and_update(normal, hased)
+
+
+def stopExecutor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    return fn(*args), start, time.perf_counter() - start
+
+
+async def _run(fn, *args):
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="hashing")
+    # Reject fast so a login burst cannot queue up behind a saturated pool.
+    if stats["inFlight"] >= HASH_WORKERS + HASH_MAX_QUEUE:
+        stats["rejected"] += 1
+        raise HashingBusy()
+
+    enqueued = time.perf_counter()
+    stats["inFlight"] += 1
+    try:
+        result, started, seconds = await asyncio.get_running_loop().run_in_executor(_executor, _timed, fn, *args)
+    finally:
+        stats["inFlight"] -= 1
+
+    stats["hashSecondsTotal"] += seconds
+    stats["hashSecondsMax"] = max(stats["hashSecondsMax"], seconds)
+    stats["waitSecondsTotal"] += started - enqueued
+    return result
+
+
+async def hashPassword(password: str) -> str:
+    hashed = await _run(Hash.bcrypt, password)
+    stats["hashed"] += 1
+    return hashed
+
+
+async def verifyPassword(hashed: str, password: str) -> tuple[bool, str | None]:
+    # Returns (valid, newHash); newHash is set when the stored hash used an
+    # outdated cost factor and should replace it.
+    valid, newHash = await _run(Hash.verifyAndUpdate, hashed, password)
+    stats["verified"] += 1
+    if newHash:
+        stats["rehashed"] += 1
+    return valid, newHash
+
+
+def report() -> dict:
+    done = stats["hashed"] + stats["verified"]
+    return {
+        "rounds": BCRYPT_ROUNDS,
+        "workers": HASH_WORKERS,
+        "maxQueue": HASH_MAX_QUEUE,
+        "inFlight": stats["inFlight"],
+        "queueDepth": max(0, stats["inFlight"] - HASH_WORKERS),
+        "rejected": stats["rejected"],
+        "hashed": stats["hashed"],
+        "verified": stats["verified"],
+        "rehashed": stats["rehashed"],
+        "hashSecondsMean": stats["hashSecondsTotal"] / done if done else 0.0,
+        "hashSecondsMax": stats["hashSecondsMax"],
+        "waitSecondsMean": stats["waitSecondsTotal"] / done if done else 0.0,
+    }
@@ -1,41 +1,51 @@
 from datetime import datetime, timedelta, timezone
-from jose import JWTError, jwt
+from jose import jwt
+from pydantic import BaseModel
+from typing import Optional
 import os
+import time
 from dotenv import load_dotenv
 
+from utils.cache import LRUCache
+
 load_dotenv()
 
+# Resolved once at import; verifyToken runs on every authenticated request.
+SECRET_KEY = os.getenv("SECRET_KEY")
+ALGORITHM = os.getenv("ALGORITHM")
+EXPIRE_MINUTES = int(os.getenv("EXPIRE_MINUTES", "30"))
+
+# Decoded tokens, keyed by the token string, each kept only until its own exp.
+_verified = LRUCache(maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "10000")), ttl=EXPIRE_MINUTES * 60)
+
+class TokenData(BaseModel):
+    username: Optional[str] = None
+
 def createAccessToken(data: dict):
     toEncode = data.copy()
     # Use UTC time instead of local time
-    expire = datetime.now(timezone.utc) + timedelta(minutes=int(os.getenv("EXPIRE_MINUTES", "30")))
+    expire = datetime.now(timezone.utc) + timedelta(minutes=EXPIRE_MINUTES)
     toEncode.update({"exp": expire})
-    encodedJWT = jwt.encode(toEncode, os.getenv("SECRET_KEY"), algorithm=os.getenv("ALGORITHM"))
-    print(f"Created token for user: {data.get('sub')}")
-    print(f"Token expires at: {expire}")  # Debug to see expiration time
-    return encodedJWT
+    return jwt.encode(toEncode, SECRET_KEY, algorithm=ALGORITHM)
 
 def verifyToken(token: str, credentialsException):
-    try:
-        print(f"Verifying token: {token[:20]}...")
-        # Decode with UTC time
-        payload = jwt.decode(token, os.getenv("SECRET_KEY"), algorithms=[os.getenv("ALGORITHM")])
-        print(f"Token payload: {payload}")
-        print(f"Current UTC time: {datetime.now(timezone.utc)}")  # Debug
-        username: str = payload.get("sub")
-        
-        if username is None:
-            print("Username is None in payload")
-            raise credentialsException
-            
-        from app import TokenData
-        tokenData = TokenData(username=username)
-        print(f"Token verified for user: {username}")
+    tokenData = _verified.get(token)
+    if tokenData is not None:
         return tokenData
 
-    except JWTError as e:
-        print(f"JWT Error: {e}")
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except Exception:
+        raise credentialsException
+
+    username = payload.get("sub")
+    if not isinstance(username, str):
         raise credentialsException
-    except Exception as e:
-        print(f"Other error in verifyToken: {e}")
-        raise credentialsException
\ No newline at end of file
+
+    tokenData = TokenData(username=username)
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        remaining = exp - time.time()
+        if remaining > 0:
+            _verified.set(token, tokenData, ttl=remaining)
+    return tokenData
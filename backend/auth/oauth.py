@@ -4,11 +4,11 @@ from auth.jwttoken import verifyToken
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+credentialsException = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
 def getCurrentUser(token: str = Depends(oauth2_scheme)):
-    credentialsException = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    return verifyToken(token, credentialsException)
\ No newline at end of file
+    return verifyToken(token, credentialsException)
@@ -0,0 +1,97 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+from types import SimpleNamespace
+
+from utils.classification import MEDICAL_USES
+
+# Stand-in for genai.Client: answers client.aio.models.generate_content with
+# canned JSON in whichever shape the caller's response_schema asks for, after
+# a log-normal delay fitted to a median and p95.
+
+LABELS = sorted(MEDICAL_USES)
+
+
+def _label(text: str) -> str:
+    # Stable per input so cache hits and recommendations are reproducible.
+    digest = hashlib.sha1(text.lower().encode("utf-8")).digest()
+    return LABELS[int.from_bytes(digest[:4], "big") % len(LABELS)]
+
+
+def _symptoms(text: str) -> dict[str, str]:
+    parts = [p.strip(" .!?") for p in re.split(r",|\band\b", text) if p.strip(" .!?")]
+    symptoms = {}
+    for part in parts or [text]:
+        symptom, _, context = part.partition(" from ")
+        symptoms[symptom.strip()] = context.strip()
+    return symptoms
+
+
+def _recipe(text: str) -> dict:
+    match = re.search(r"common_name:([^,]*)", text)
+    plant = (match.group(1).strip() if match else "") or "Herbal"
+    return {
+        "recipeName": f"{plant} Tea",
+        "ingredients": ["1 tbsp dried leaves", "250 ml boiling water", "1 tsp honey"],
+        "instructions": "Steep the leaves in the water for five minutes. Strain, stir in the honey and serve warm. " * 3,
+    }
+
+
+class FakeModels:
+    def __init__(self, medianMs: float, p95Ms: float, errorRate: float):
+        self.mu = math.log(max(medianMs, 0.001) / 1000)
+        self.sigma = math.log(max(p95Ms, medianMs) / max(medianMs, 0.001)) / 1.645
+        self.errorRate = errorRate
+        self.calls = 0
+
+    async def generate_content(self, model, contents, config):
+        self.calls += 1
+        await asyncio.sleep(random.lognormvariate(self.mu, self.sigma))
+        if random.random() < self.errorRate:
+            raise RuntimeError("fake Vertex AI error")
+
+        text = contents[0].parts[0].text
+        shape = set((config.response_schema or {}).get("properties", {}))
+        if "findings" in shape:
+            body = {"findings": [
+                {"symptom": s, "context": c, "medicalUse": _label(f"{s} due to {c}" if c else s)}
+                for s, c in _symptoms(text).items()
+            ]}
+        elif "outputs" in shape:
+            body = {"outputs": {item: _label(item) for item in json.loads(text)["inputs"]}}
+        elif "symptoms" in shape:
+            body = {"symptoms": _symptoms(text)}
+        else:
+            body = {"output": _recipe(text)}
+
+        payload = json.dumps(body)
+        usage = SimpleNamespace(
+            prompt_token_count=len(text) // 4 + 200,
+            candidates_token_count=len(payload) // 4,
+            thoughts_token_count=0
+        )
+        return SimpleNamespace(text=payload, usage_metadata=usage)
+
+
+    async def generate_content_stream(self, model, contents, config):
+        # Same canned answer, delivered in small pieces like a token stream.
+        response = await self.generate_content(model, contents, config)
+
+        async def chunks():
+            text = response.text
+            for i in range(0, len(text), 16):
+                await asyncio.sleep(0.002)
+                last = i + 16 >= len(text)
+                yield SimpleNamespace(text=text[i:i + 16], usage_metadata=response.usage_metadata if last else None)
+        return chunks()
+
+
+class FakeClient:
+    def __init__(self, medianMs: float = 400, p95Ms: float = 1500, errorRate: float = 0.0):
+        self.aio = SimpleNamespace(models=FakeModels(medianMs, p95Ms, errorRate), aclose=self._aclose)
+
+    async def _aclose(self):
+        pass
@@ -0,0 +1,255 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+# Offline load test: local mongod (or --mongo-uri), SMTP sink, the app with a
+# fake Vertex AI client, and an open-loop load generator at a target RPS.
+# Usage: python bench/run.py --scenario mixed --rps 50 --duration 30
+# Needs `mongod` on PATH (or --mongo-uri) and bench/requirements.txt.
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND)
+
+import httpx
+from pymongo import MongoClient
+
+from bench import scenarios
+from bench.seed import BENCH_USER, seed
+from bench.smtpsink import SMTPSink
+
+BENCH_ENV = {
+    "DB_NAME": "elara_bench",
+    "COLL_NAME": "pfaf_plants",
+    "USER_DB_NAME": "elara_bench_users",
+    "SECRET_KEY": "bench-secret",
+    "ALGORITHM": "HS256",
+    "SMTP_SSL": "0",
+    "SMTP_SERVER": "127.0.0.1",
+    "SMTP_PASSWORD": "",
+    "PFAF_BASE_URL": "http://127.0.0.1:9/unreachable",
+}
+
+
+def freePort() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def startMongod() -> tuple[str, subprocess.Popen, str]:
+    binary = shutil.which("mongod")
+    if binary is None:
+        raise SystemExit("❌ mongod not found on PATH; install MongoDB locally or pass --mongo-uri")
+    dbpath = tempfile.mkdtemp(prefix="elara-bench-")
+    port = freePort()
+    # /register and /verify-email run in transactions, which need a replica set.
+    proc = subprocess.Popen(
+        [binary, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1", "--quiet", "--replSet", "bench"],
+        stdout=subprocess.DEVNULL
+    )
+    uri = f"mongodb://127.0.0.1:{port}/?directConnection=true"
+    client = MongoClient(uri, serverSelectionTimeoutMS=30000)
+    client.admin.command("replSetInitiate", {"_id": "bench", "members": [{"_id": 0, "host": f"127.0.0.1:{port}"}]})
+    deadline = time.monotonic() + 60
+    while not client.admin.command("hello").get("isWritablePrimary"):
+        if time.monotonic() > deadline:
+            raise SystemExit("❌ mongod did not become primary within 60s")
+        time.sleep(0.2)
+    client.close()
+    return uri, proc, dbpath
+
+
+def waitFor(url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise SystemExit(f"❌ {url} did not come up within {timeout:.0f}s")
+
+
+def percentile(sortedValues: list[float], p: float) -> float:
+    if not sortedValues:
+        return 0.0
+    index = min(len(sortedValues) - 1, max(0, round(p / 100 * len(sortedValues)) - 1))
+    return sortedValues[index]
+
+
+async def drive(baseUrl: str, scenario: str, rps: float, duration: float, state: dict, maxInFlight: int) -> dict:
+    results: dict[str, list] = {}
+    dropped = 0
+    inFlight = 0
+    limits = httpx.Limits(max_connections=maxInFlight, max_keepalive_connections=maxInFlight)
+
+    async with httpx.AsyncClient(base_url=baseUrl, timeout=120, limits=limits) as client:
+        login = await client.post("/login", data={"username": state["username"], "password": state["password"]})
+        login.raise_for_status()
+        state["token"] = login.json()["access_token"]
+
+        async def one(op):
+            nonlocal inFlight
+            start = time.perf_counter()
+            try:
+                label, response = await op(client, state)
+                ok = response.status_code < 400
+                status = response.status_code
+            except Exception as e:
+                label, ok, status = op.__name__, False, type(e).__name__
+            finally:
+                inFlight -= 1
+            results.setdefault(label, []).append((time.perf_counter() - start, ok, status))
+
+        # Open loop: requests are issued on schedule whether or not earlier
+        # ones have finished, so queueing in the app shows up as latency.
+        tasks = []
+        begin = time.perf_counter()
+        total = int(rps * duration)
+        for i in range(total):
+            delay = begin + i / rps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if inFlight >= maxInFlight:
+                dropped += 1
+                continue
+            inFlight += 1
+            tasks.append(asyncio.create_task(one(scenarios.pick(scenario))))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - begin
+
+    report = {"scenario": scenario, "targetRps": rps, "seconds": round(elapsed, 2), "dropped": dropped, "endpoints": {}}
+    for label, samples in sorted(results.items()):
+        latencies = sorted(s[0] * 1000 for s in samples)
+        errors = [s[2] for s in samples if not s[1]]
+        report["endpoints"][label] = {
+            "requests": len(samples),
+            "errors": len(errors),
+            "errorStatuses": sorted(set(map(str, errors))),
+            "throughputRps": round(len(samples) / elapsed, 2),
+            "p50Ms": round(percentile(latencies, 50), 1),
+            "p95Ms": round(percentile(latencies, 95), 1),
+            "p99Ms": round(percentile(latencies, 99), 1),
+        }
+    return report
+
+
+async def drainMail(sink: SMTPSink, sent: dict[str, float], timeout: float) -> dict:
+    # Verification mail is sent by the app's outbox worker after /register
+    # returns, so wait for the stragglers before measuring delivery.
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline and not sent.keys() <= sink.arrivals.keys():
+        await asyncio.sleep(0.1)
+    latencies = sorted((sink.arrivals[email] - at) * 1000 for email, at in sent.items() if email in sink.arrivals)
+    return {
+        "queued": len(sent),
+        "received": sink.received,
+        "delivered": len(latencies),
+        "undelivered": len(sent) - len(latencies),
+        "p50Ms": round(percentile(latencies, 50), 1),
+        "p95Ms": round(percentile(latencies, 95), 1),
+        "maxMs": round(latencies[-1], 1) if latencies else 0.0,
+    }
+
+
+def printReport(report: dict):
+    print(f"\nScenario {report['scenario']} at {report['targetRps']} rps for {report['seconds']}s"
+          f" ({report['dropped']} dropped at the in-flight cap)")
+    print(f"{'endpoint':32} {'reqs':>6} {'errs':>5} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for label, row in report["endpoints"].items():
+        print(f"{label:32} {row['requests']:>6} {row['errors']:>5} {row['throughputRps']:>7} "
+              f"{row['p50Ms']:>8} {row['p95Ms']:>8} {row['p99Ms']:>8}")
+    mail = report["mail"]
+    print(f"\nSMTP sink received {mail['received']} messages; {mail['delivered']}/{mail['queued']} verification emails"
+          f" delivered (p50 {mail['p50Ms']} ms, p95 {mail['p95Ms']} ms, max {mail['maxMs']} ms from /register)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load test against local stand-ins")
+    parser.add_argument("--scenario", choices=sorted(scenarios.SCENARIOS), default="mixed")
+    parser.add_argument("--rps", type=float, default=20)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--max-in-flight", type=int, default=500)
+    parser.add_argument("--mongo-uri", help="use this MongoDB (a replica set) instead of starting mongod")
+    parser.add_argument("--plants", type=int, default=8000)
+    parser.add_argument("--unique-rate", type=float, default=0.3, help="share of recommendation queries that miss the caches")
+    parser.add_argument("--pdf-engine", choices=["weasyprint", "fast"])
+    parser.add_argument("--pdf-variety", type=int, default=50, help="distinct recipes rendered, the rest hit the PDF cache")
+    parser.add_argument("--vertex-median-ms", type=float, default=400)
+    parser.add_argument("--vertex-p95-ms", type=float, default=1500)
+    parser.add_argument("--vertex-error-rate", type=float, default=0.0)
+    parser.add_argument("--mail-drain", type=float, default=30, help="seconds to wait for queued verification emails")
+    parser.add_argument("--output", help="write the report as JSON")
+    parser.add_argument("--max-p95-ms", type=float, help="exit non-zero if any endpoint's p95 exceeds this")
+    args = parser.parse_args()
+
+    random.seed(0)
+    mongod = None
+    if args.mongo_uri:
+        uri = args.mongo_uri
+    else:
+        uri, mongod, dbpath = startMongod()
+
+    smtpPort = freePort()
+    sink = SMTPSink(smtpPort)
+    server = None
+    sinkStarted = False
+    try:
+        env = {**os.environ, **BENCH_ENV, "MONGODB_URI": uri, "SMTP_PORT": str(smtpPort)}
+        os.environ.update(env)
+        plants = seed(uri, plants=args.plants)
+        sink.start()
+        sinkStarted = True
+
+        appPort = freePort()
+        server = subprocess.Popen([
+            sys.executable, os.path.join(BENCH_DIR, "server.py"), "--port", str(appPort),
+            "--vertex-median-ms", str(args.vertex_median_ms),
+            "--vertex-p95-ms", str(args.vertex_p95_ms),
+            "--vertex-error-rate", str(args.vertex_error_rate),
+        ], env=env)
+        baseUrl = f"http://127.0.0.1:{appPort}"
+        waitFor(baseUrl + "/metrics")
+
+        state = {
+            "username": BENCH_USER["username"],
+            "password": BENCH_USER["password"],
+            "plants": plants,
+            "saved": [],
+            "deleted": [],
+            "mailSent": {},
+            "uniqueRate": args.unique_rate,
+            "pdfEngine": args.pdf_engine,
+            "pdfVariety": args.pdf_variety,
+        }
+        report = asyncio.run(drive(baseUrl, args.scenario, args.rps, args.duration, state, args.max_in_flight))
+        report["mail"] = asyncio.run(drainMail(sink, state["mailSent"], args.mail_drain))
+        printReport(report)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+
+        if args.max_p95_ms is not None:
+            slow = [label for label, row in report["endpoints"].items() if row["p95Ms"] > args.max_p95_ms]
+            if slow:
+                print(f"❌ p95 over {args.max_p95_ms:.0f}ms: {', '.join(slow)}")
+                sys.exit(1)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        if sinkStarted:
+            sink.stop()
+        if mongod is not None:
+            mongod.terminate()
+            mongod.wait(timeout=30)
+            shutil.rmtree(dbpath, ignore_errors=True)
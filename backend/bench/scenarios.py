@@ -0,0 +1,101 @@
+import itertools
+import random
+import time
+
+# Each operation takes (client, state) and returns (endpoint label, response).
+# state holds the bench user's token, seeded plants and saved recipe ids.
+
+_signups = itertools.count()
+
+CONCERNS = [
+    "I have a headache", "stomach ache from gas and nausea", "sore throat and a cough",
+    "trouble sleeping", "period pain", "anxiety from work", "a burn on my hand",
+    "itchy skin rash", "constipation", "fever and chills", "joint pain", "heartburn after meals",
+]
+
+RECIPE = {
+    "symptom": "headache",
+    "recipeName": "Peppermint Leaf Tea",
+    "ingredients": ["1 tbsp dried peppermint", "250 ml boiling water", "1 tsp honey"],
+    "instructions": "Steep the peppermint in the water for five minutes. Strain and stir in the honey. " * 4,
+}
+
+
+def _auth(state) -> dict:
+    return {"Authorization": f"Bearer {state['token']}"}
+
+
+async def recommendations(client, state):
+    concern = random.choice(CONCERNS)
+    if random.random() < state["uniqueRate"]:
+        # A previously unseen phrasing misses the extract/classify caches.
+        concern = f"{concern} since {random.randint(1, 10**6)} days"
+    return "POST /getRecommendations", await client.post(
+        "/getRecommendations", json={"medicalConcern": concern, "edible": random.random() < 0.5}, headers=_auth(state))
+
+
+async def recipe(client, state):
+    plant = random.choice(state["plants"])
+    return "POST /getRecipe", await client.post("/getRecipe", json=plant, headers=_auth(state))
+
+
+async def pdf(client, state):
+    body = dict(RECIPE, recipeName=f"Peppermint Leaf Tea {random.randint(1, state['pdfVariety'])}")
+    params = {"engine": state["pdfEngine"]} if state["pdfEngine"] else None
+    return "POST /downloadRecipePDF", await client.post("/downloadRecipePDF", json=body, params=params, headers=_auth(state))
+
+
+async def login(client, state):
+    form = {"username": state["username"], "password": state["password"]}
+    return "POST /login", await client.post("/login", data=form)
+
+
+async def crud(client, state):
+    # Weighted so the saved and deleted pools stay non-empty.
+    saved, deleted = state["saved"], state["deleted"]
+    roll = random.random()
+    if roll < 0.35 or not saved:
+        response = await client.post("/saveRecipe", json=RECIPE, headers=_auth(state))
+        if response.status_code == 200:
+            saved.append(response.json()["id"])
+        return "POST /saveRecipe", response
+    if roll < 0.7:
+        return "GET /getSavedRecipes", await client.get("/getSavedRecipes", headers=_auth(state))
+    if roll < 0.85 or not deleted:
+        recipeId = saved.pop(random.randrange(len(saved)))
+        response = await client.delete(f"/deleteRecipe/{recipeId}", headers=_auth(state))
+        deleted.append(recipeId)
+        return "DELETE /deleteRecipe/{id}", response
+    recipeId = deleted.pop(random.randrange(len(deleted)))
+    response = await client.post(f"/recoverRecipe/{recipeId}", headers=_auth(state))
+    saved.append(recipeId)
+    return "POST /recoverRecipe/{id}", response
+
+
+async def register(client, state):
+    # A fresh account per call so every sign-up queues a verification email
+    # through the outbox; the send time is kept to measure delivery latency.
+    n = next(_signups)
+    email = f"load{n}@bench.test"
+    body = {"username": f"load{n}", "email": email, "password": "bench-password"}
+    sent = time.perf_counter()
+    response = await client.post("/register", json=body)
+    if response.status_code == 200:
+        state["mailSent"][email] = sent
+    return "POST /register", response
+
+
+SCENARIOS = {
+    "recommendations": [(1, recommendations)],
+    "recipe": [(1, recipe)],
+    "pdf": [(1, pdf)],
+    "login": [(1, login)],
+    "crud": [(1, crud)],
+    "register": [(1, register)],
+    "mixed": [(5, recommendations), (2, recipe), (1, pdf), (1, login), (3, crud), (1, register)],
+}
+
+
+def pick(name: str):
+    weighted = SCENARIOS[name]
+    return random.choices([op for _, op in weighted], weights=[w for w, _ in weighted])[0]
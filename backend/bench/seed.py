@@ -0,0 +1,63 @@
+import os
+import random
+
+from utils.classification import MEDICAL_USES
+
+# Synthetic PFAF-shaped catalog plus a verified user, loaded through the same
+# normalize() and indexes as database/ingest.py.
+
+BENCH_USER = {"username": "bench", "email": "bench@example.com", "password": "bench-password"}
+
+_GENERA = ["Mentha", "Salvia", "Thymus", "Urtica", "Achillea", "Matricaria", "Calendula", "Sambucus",
+           "Rosa", "Plantago", "Taraxacum", "Melissa", "Ocimum", "Rubus", "Zingiber", "Allium"]
+_EPITHETS = ["officinalis", "vulgaris", "sylvestris", "major", "minor", "arvensis", "montana", "alba",
+             "nigra", "rubra", "canadensis", "japonica", "sinensis", "dioica", "recutita", "piperita"]
+_COMMON = ["Mint", "Sage", "Thyme", "Nettle", "Yarrow", "Chamomile", "Marigold", "Elder",
+           "Rose", "Plantain", "Dandelion", "Balm", "Basil", "Bramble", "Ginger", "Garlic"]
+_HAZARDS = ["None known"] * 3 + ["Toxic in large doses", "Skin irritant"]
+
+
+def plantRows(count: int, rng: random.Random) -> list[dict]:
+    labels = sorted(MEDICAL_USES)
+    rows = []
+    for i in range(count):
+        g, e = rng.randrange(len(_GENERA)), rng.randrange(len(_EPITHETS))
+        latin = f"{_GENERA[g]} {_EPITHETS[e]} {i}"
+        rows.append({
+            "latin_name_search": latin,
+            "common_name_search": f"{_EPITHETS[e].title()} {_COMMON[g]} {i}",
+            "use_keyword": labels[i % len(labels)] if i < len(labels) * 3 else rng.choice(labels),
+            "medicinal_rating_search": str(rng.randint(0, 5)),
+            "edibility_rating_search": rng.choice([str(rng.randint(0, 5)), float("nan")]),
+            "Edible Uses": "Leaves are eaten raw or cooked. A tea is made from the leaves.",
+            "Known Hazards": rng.choice(_HAZARDS),
+            "Image URLs": f"https://example.com/{i}/a.jpg; https://example.com/{i}/b.jpg",
+            "plant_url": f"https://pfaf.org/user/Plant.aspx?LatinName={latin.replace(' ', '+')}",
+        })
+    return rows
+
+
+def seed(uri: str, plants: int = 8000, seed: int = 0):
+    os.environ["MONGODB_URI"] = uri
+    from auth.hashing import Hash
+    from database import ingest
+
+    client = ingest.client
+    client.drop_database(ingest.db)
+    client.drop_database(os.environ["USER_DB_NAME"])
+
+    docs = [ingest.normalize(row) for row in plantRows(plants, random.Random(seed))]
+    ingest.plants.create_index([(ingest.KEY, 1)], unique=True)
+    ingest.plants.insert_many(docs, ordered=False)
+    ingest.buildIndexes()
+
+    users = client[os.environ["USER_DB_NAME"]]["users"]
+    users.insert_one({
+        "email": BENCH_USER["email"],
+        "username": BENCH_USER["username"],
+        "password": Hash.bcrypt(BENCH_USER["password"]),
+        "email_verified": True,
+    })
+    print(f"Seeded {len(docs):,} plants into {ingest.db}.{ingest.coll} and user '{BENCH_USER['username']}'")
+    return [{"plantName": d["common_name_search"], "scientificName": d["latin_name_search"],
+             "edibleUses": d["Edible Uses"]} for d in docs[:500]]
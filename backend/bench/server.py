@@ -0,0 +1,30 @@
+import argparse
+import os
+import sys
+
+# Runs the real app under uvicorn with Vertex AI swapped for bench/fakegenai.py.
+# Mongo and SMTP come from the environment bench/run.py sets up.
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.chdir(BACKEND)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the app against local stand-ins")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--vertex-median-ms", type=float, default=400)
+    parser.add_argument("--vertex-p95-ms", type=float, default=1500)
+    parser.add_argument("--vertex-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    import uvicorn
+    from bench.fakegenai import FakeClient
+    from utils import vertex
+
+    # startClient() keeps an existing client, so the fake is used everywhere.
+    vertex._client = FakeClient(args.vertex_median_ms, args.vertex_p95_ms, args.vertex_error_rate)
+
+    # The app mounts static/ at import; a fresh checkout may not have it yet.
+    os.makedirs("static", exist_ok=True)
+    from app import app
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
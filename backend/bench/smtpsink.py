@@ -0,0 +1,40 @@
+import time
+
+from aiosmtpd.controller import Controller
+
+# Local SMTP server that accepts and counts mail. Pair with SMTP_SSL=0.
+# Arrival times use time.perf_counter so the load generator in the same
+# process can match them against the request that queued each message.
+
+
+class _Handler:
+    def __init__(self):
+        self.received = 0
+        self.arrivals: dict[str, float] = {}
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        now = time.perf_counter()
+        for rcpt in envelope.rcpt_tos:
+            self.arrivals.setdefault(rcpt, now)
+        return "250 OK"
+
+
+class SMTPSink:
+    def __init__(self, port: int, host: str = "127.0.0.1"):
+        self.handler = _Handler()
+        self.controller = Controller(self.handler, hostname=host, port=port)
+
+    @property
+    def received(self) -> int:
+        return self.handler.received
+
+    @property
+    def arrivals(self) -> dict[str, float]:
+        return self.handler.arrivals
+
+    def start(self):
+        self.controller.start()
+
+    def stop(self):
+        self.controller.stop()
@@ -0,0 +1,43 @@
+import argparse
+import os
+import sys
+import time
+
+# Micro-benchmark for the auth dependency every protected route runs.
+# Usage: python bench/tokens.py [--iterations N] [--budget-us US]
+# Exits non-zero when the cached path is slower than the budget.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+from auth.jwttoken import createAccessToken, _verified
+from auth.oauth import getCurrentUser
+
+
+def timeCalls(token: str, iterations: int, clearCache: bool) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if clearCache:
+            _verified._data.clear()
+        getCurrentUser(token)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark getCurrentUser")
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--budget-us", type=float, default=float(os.getenv("AUTH_BUDGET_US", "10")))
+    args = parser.parse_args()
+
+    token = createAccessToken(data={"sub": "bench-user"})
+    getCurrentUser(token)
+
+    cold = timeCalls(token, max(1, args.iterations // 100), clearCache=True)
+    warm = timeCalls(token, args.iterations, clearCache=False)
+    print(f"getCurrentUser: full decode {cold:.2f}µs/call, cached {warm:.2f}µs/call")
+
+    if warm > args.budget_us:
+        print(f"❌ cached path is over the {args.budget_us:.1f}µs budget")
+        sys.exit(1)
+    print(f"✅ cached path is within the {args.budget_us:.1f}µs budget")
@@ -0,0 +1,49 @@
+import argparse
+import asyncio
+import os
+import sys
+
+from tqdm import tqdm
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import mongo
+from utils import medicinal
+
+
+async def crawl(concurrency: int, force: bool = False):
+    await mongo.connect()
+    medicinal.startClient()
+    try:
+        names = await mongo.plants().distinct("latin_name_search")
+        names = [n for n in names if isinstance(n, str) and n.strip()]
+        semaphore = asyncio.Semaphore(concurrency)
+        progress = tqdm(total=len(names), desc="Crawling", unit="plants")
+        failed = []
+
+        async def one(name: str):
+            async with semaphore:
+                try:
+                    if force or not await medicinal.isFresh(name):
+                        await medicinal.fetchMedicinalUses(name)
+                except Exception as e:
+                    failed.append(name)
+                    tqdm.write(f"{name}: {e}")
+                progress.update(1)
+
+        await asyncio.gather(*(one(name) for name in names))
+        progress.close()
+    finally:
+        await medicinal.closeClient()
+        await mongo.close()
+
+    print(f"✅ Medicinal uses cached for {len(names) - len(failed):,} of {len(names):,} plants")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-fill the PFAF medicinal-uses cache for every plant in the catalog")
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get("CRAWL_CONCURRENCY", "8")))
+    parser.add_argument("--force", action="store_true", help="refetch plants that are still fresh")
+    args = parser.parse_args()
+    asyncio.run(crawl(args.concurrency, force=args.force))
@@ -1,30 +1,209 @@
+import argparse
+import hashlib
+import json
+import math
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
 import pandas as pd
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo import ASCENDING, DESCENDING, ReplaceOne
+from pymongo.errors import OperationFailure
 from dotenv import load_dotenv
 from tqdm import tqdm
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import mongo
+
 load_dotenv()
 
-uri  = os.environ["MONGODB_URI"]
 db   = os.environ.get("DB_NAME",  "ai_in_action")
 coll = os.environ.get("COLL_NAME","pfaf_plants")
 
-client = MongoClient(uri)
+BATCH   = int(os.environ.get("INGEST_BATCH", "1000"))
+WORKERS = int(os.environ.get("INGEST_WORKERS", "4"))
+KEY     = "latin_name_search"
+
+client = mongo.syncClient(maxPoolSize=WORKERS + 1, socketTimeoutMS=120000)
 plants = client[db][coll]
 
-csv_path = os.path.join(os.path.dirname(__file__), "data\pfaf_plants_merged_2.csv")
-df = pd.read_csv(csv_path)
+default_csv = os.path.join(os.path.dirname(__file__), "data", "pfaf_plants_merged_2.csv")
+
+
+def checkpointPath(csv_path: str) -> str:
+    # Tied to the file's identity so editing the CSV starts a fresh load.
+    stat = os.stat(csv_path)
+    ident = f"{os.path.abspath(csv_path)}:{stat.st_size}:{stat.st_mtime_ns}:{BATCH}:{db}.{coll}"
+    digest = hashlib.sha1(ident.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(os.path.dirname(__file__), f".ingest_checkpoint_{digest}.json")
+
+
+def loadCheckpoint(path: str) -> set[int]:
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return set(json.load(f)["done"])
+
+
+def saveCheckpoint(path: str, done: set[int]):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"done": sorted(done)}, f)
+    os.replace(tmp, path)
+
+
+def toRating(value) -> int:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def normalize(doc: dict) -> dict:
+    # Do the parsing the recommender used to repeat on every request: no NaN,
+    # integer ratings, image URLs as a list and a boolean safety flag.
+    doc = {k: (None if isinstance(v, float) and math.isnan(v) else v) for k, v in doc.items()}
+    doc["medicinal_rating_search"] = toRating(doc.get("medicinal_rating_search"))
+    doc["edibility_rating_search"] = toRating(doc.get("edibility_rating_search"))
+    raw_images = doc.get("Image URLs") or ""
+    doc["image_urls"] = [u.strip() for u in str(raw_images).split(";") if u.strip()]
+    doc["is_safe"] = doc.get("Known Hazards") == "None known"
+    return doc
+
+
+# Both bestPlant sort orders, equality fields first, so the lookup is an
+# IXSCAN that walks the index in order and never sorts in memory.
+RECOMMENDER_INDEXES = [
+    [("use_keyword", ASCENDING), ("is_safe", ASCENDING),
+     ("medicinal_rating_search", DESCENDING), ("edibility_rating_search", DESCENDING)],
+    [("use_keyword", ASCENDING), ("is_safe", ASCENDING),
+     ("edibility_rating_search", DESCENDING), ("medicinal_rating_search", DESCENDING)],
+]
+STALE_INDEXES = ["uses_1", "medicinal_rating_-1_edibility_rating_-1", "hazards_1"]
+
+
+def buildIndexes():
+    for name in STALE_INDEXES:
+        try:
+            plants.drop_index(name)
+        except OperationFailure:
+            pass
+    for keys in RECOMMENDER_INDEXES:
+        plants.create_index(keys)
+
+
+def planStages(plan: dict):
+    # Classic plans nest stages directly; the slot-based engine wraps the
+    # same tree in "queryPlan" next to its own "slotBasedPlan".
+    if "stage" in plan:
+        yield plan["stage"]
+    for child in ("queryPlan", "inputStage", "outerStage", "innerStage"):
+        if child in plan:
+            yield from planStages(plan[child])
+    for child in plan.get("inputStages", []):
+        yield from planStages(child)
+
+
+def checkQueryPlans():
+    sample = plants.find_one({"is_safe": True, "use_keyword": {"$ne": None}}, {"use_keyword": 1})
+    if sample is None:
+        return
+    keyword = sample["use_keyword"]
+    if isinstance(keyword, list):
+        keyword = keyword[0]
+
+    for keys in RECOMMENDER_INDEXES:
+        sort = keys[2:]
+        explain = plants.find({"use_keyword": keyword, "is_safe": True}).sort(sort).limit(3).explain()
+        stages = set(planStages(explain["queryPlanner"]["winningPlan"]))
+        if not stages:
+            raise SystemExit(f"❌ Could not read the query plan for {sort}: {explain['queryPlanner']['winningPlan']}")
+        if "COLLSCAN" in stages or "SORT" in stages:
+            raise SystemExit(f"❌ Recommender query sorted by {sort} is not index-backed: {sorted(stages)}")
+    print("✅ Recommender queries use IXSCAN with no in-memory sort")
+
+
+def upsertChunk(chunk: pd.DataFrame) -> int:
+    docs = [normalize(doc) for doc in chunk.to_dict(orient="records")]
+    ops = [ReplaceOne({KEY: doc[KEY]}, doc, upsert=True) for doc in docs if pd.notna(doc.get(KEY))]
+    if not ops:
+        return 0
+    plants.bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def removeDuplicates():
+    # The old loader inserted every row again on each run, so a collection it
+    # filled holds several copies per plant and the unique index below would
+    # refuse to build. Keep the newest copy; the load overwrites it anyway.
+    removed = 0
+    groups = plants.aggregate([
+        {"$match": {KEY: {"$type": "string"}}},
+        {"$group": {"_id": f"${KEY}", "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ], allowDiskUse=True)
+    for group in groups:
+        stale = sorted(group["ids"])[:-1]
+        removed += plants.delete_many({"_id": {"$in": stale}}).deleted_count
+    if removed:
+        print(f"Removed {removed:,} duplicate documents left by earlier loads")
+
+    unkeyed = plants.count_documents({KEY: {"$not": {"$type": "string"}}}, limit=2)
+    if unkeyed > 1:
+        raise SystemExit(
+            f"❌ {db}.{coll} has documents without a {KEY}, so a unique index on it cannot be built. "
+            f"Remove them (or drop the collection) and run the load again."
+        )
+
+
+def ingest(csv_path: str, restart: bool = False):
+    checkpoint = checkpointPath(csv_path)
+    done = set() if restart else loadCheckpoint(checkpoint)
+    if done:
+        print(f"Resuming: {len(done)} batches already loaded")
+
+    # Upserts match on the latin name, so it needs an index before the load.
+    removeDuplicates()
+    plants.create_index([(KEY, ASCENDING)], unique=True)
+
+    total = 0
+    pending = {}
+    progress = tqdm(desc="Uploading", unit="docs")
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        for number, chunk in enumerate(pd.read_csv(csv_path, chunksize=BATCH)):
+            if number in done:
+                continue
+            pending[pool.submit(upsertChunk, chunk)] = number
+
+            # Keep at most two batches per worker in memory.
+            if len(pending) >= WORKERS * 2:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    count = future.result()
+                    done.add(pending.pop(future))
+                    saveCheckpoint(checkpoint, done)
+                    total += count
+                    progress.update(count)
+
+        for future in list(pending):
+            count = future.result()
+            done.add(pending.pop(future))
+            saveCheckpoint(checkpoint, done)
+            total += count
+            progress.update(count)
+    progress.close()
 
-docs = df.to_dict(orient="records")
+    buildIndexes()
+    checkQueryPlans()
 
-BATCH = 1000
-for i in tqdm(range(0, len(docs), BATCH), desc="Uploading"):
-    plants.insert_many(docs[i:i+BATCH])
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    print(f"✅ Upserted {total:,} documents into {db}.{coll}")
 
-plants.create_index([("uses", ASCENDING)])
-plants.create_index([("medicinal_rating", DESCENDING),
-                     ("edibility_rating",  DESCENDING)])
-plants.create_index([("hazards", ASCENDING)], sparse=True)
 
-print(f"✅ Imported {len(docs):,} documents into {db}.{coll}")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the PFAF plant CSV into MongoDB")
+    parser.add_argument("csv", nargs="?", default=default_csv)
+    parser.add_argument("--restart", action="store_true", help="ignore any saved checkpoint")
+    args = parser.parse_args()
+    ingest(args.csv, restart=args.restart)
@@ -0,0 +1,114 @@
+import os
+
+from dotenv import load_dotenv
+from pymongo import AsyncMongoClient, MongoClient
+from pymongo.errors import OperationFailure
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+
+from utils import metrics
+
+load_dotenv()
+
+# One AsyncMongoClient per process, opened in the FastAPI lifespan. Every
+# route, the recommender and the caches borrow collections from here instead
+# of building their own blocking MongoClient.
+client: AsyncMongoClient | None = None
+
+USER_DB = os.getenv("USER_DB_NAME", "User")
+
+def settings(**overrides) -> dict:
+    options = {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_MS", "300000")),
+        "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000")),
+        "readPreference": os.getenv("MONGO_READ_PREFERENCE", "primary"),
+        "retryWrites": True,
+    }
+    options.update(overrides)
+    return options
+
+async def connect() -> AsyncMongoClient:
+    global client
+    if client is None:
+        client = AsyncMongoClient(os.getenv("MONGODB_URI"), event_listeners=[metrics.mongoListener], **settings())
+        await ensureIndexes()
+    return client
+
+async def close():
+    global client
+    if client is not None:
+        await client.close()
+        client = None
+
+def syncClient(**overrides) -> MongoClient:
+    # For offline scripts such as database/ingest.py that are not on an event loop.
+    return MongoClient(os.getenv("MONGODB_URI"), **settings(**overrides))
+
+def _client() -> AsyncMongoClient:
+    if client is None:
+        raise RuntimeError("MongoDB is not connected; call database.mongo.connect() first")
+    return client
+
+def startSession():
+    # Transactions need a replica set or sharded cluster (Atlas always is).
+    return _client().start_session()
+
+def users():
+    return _client()[USER_DB]["users"]
+
+def pendingUsers():
+    return _client()[USER_DB]["pending_users"]
+
+def savedRecipes():
+    return _client()[USER_DB]["saved_recipes"]
+
+def outbox():
+    return _client()[USER_DB]["email_outbox"]
+
+def plants():
+    coll = _client()[os.getenv("DB_NAME")][os.getenv("COLL_NAME")]
+    # The catalog is read-only at request time, so it can be served from
+    # secondaries without affecting user data consistency.
+    mode = os.getenv("PLANT_READ_PREFERENCE")
+    if mode:
+        coll = coll.with_options(read_preference=make_read_preference(read_pref_mode_from_name(mode), None))
+    return coll
+
+def cacheCollection(name: str):
+    return _client()[os.getenv("DB_NAME")][name]
+
+async def ensureIndexes():
+    await savedRecipes().create_index(
+        [("deletedAt", 1)],
+        expireAfterSeconds=864000
+    )
+    # Serves both listings in sort order: saved recipes are userId + deletedAt
+    # null sorted by savedAt, recently deleted are userId + a deletedAt range
+    # sorted by deletedAt. _id is the keyset tie-breaker.
+    await savedRecipes().create_index(
+        [("userId", 1), ("deletedAt", -1), ("savedAt", -1), ("_id", -1)]
+    )
+
+    await pendingUsers().create_index(
+        [("verification_token_expires", 1)],
+        expireAfterSeconds=0
+    )
+    await pendingUsers().create_index([("verification_token", 1)])
+
+    # Registration relies on these to reject duplicates atomically.
+    for collection in (users(), pendingUsers()):
+        for field in ("username", "email"):
+            try:
+                await collection.create_index([(field, 1)], unique=True)
+            except OperationFailure as e:
+                print(f"Unique {field} index on {collection.name} not created, existing duplicates must be resolved first: {e}")
+
+    await outbox().create_index([("status", 1), ("nextAttemptAt", 1)])
+    # Delivered mail is only kept a week; failed mail stays for inspection.
+    await outbox().create_index(
+        [("sentAt", 1)],
+        expireAfterSeconds=7 * 24 * 3600
+    )
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from utils import classification, fused
+
+
+class MemoryCache:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def getMany(self, keys):
+        return {key: self.data[key] for key in keys if key in self.data}
+
+    async def set(self, key, value):
+        self.data[key] = value
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    # Records what the fused call is asked and answers one finding per clause.
+    asked = []
+    answers = {"weird tingling in my toes": ("tingling", "", "Stimulant")}
+
+    async def extractAndClassify(condition):
+        asked.append(condition)
+        symptom, context, label = answers[condition]
+        return {"symptoms": {symptom: context}}, {"outputs": {symptom: label}}
+
+    async def classifyWithLLM(texts):
+        raise AssertionError(f"classifier LLM called for {texts}")
+
+    classifyCache = MemoryCache()
+    for module in (fused, classification):
+        monkeypatch.setattr(module, "classifyCache", classifyCache)
+    monkeypatch.setattr(fused, "extractCache", MemoryCache())
+    monkeypatch.setattr(fused, "extractAndClassify", extractAndClassify)
+    monkeypatch.setattr(classification, "_classifyWithLLM", classifyWithLLM)
+    return asked
+
+
+def testLocalMatchesSkipGemini(gemini):
+    symptoms, classes = asyncio.run(fused.analyzeFused("I have a headache and a sore throat"))
+    assert gemini == []
+    assert symptoms == {"symptoms": {"headache": "", "sore throat": ""}}
+    assert classes == {"outputs": {"headache": "Analgesic", "sore throat": "Demulcent"}}
+
+
+def testOnlyUnresolvedClausesReachGemini(gemini):
+    symptoms, classes = asyncio.run(fused.analyzeFused("weird tingling in my toes and a headache"))
+    assert gemini == ["weird tingling in my toes"]
+    assert classes == {"outputs": {"headache": "Analgesic", "tingling": "Stimulant"}}
+
+
+def testRepeatIsServedFromTheCaches(gemini):
+    first = asyncio.run(fused.analyzeFused("weird tingling in my toes and a headache"))
+    second = asyncio.run(fused.analyzeFused("Weird tingling in my toes and a headache!"))
+    assert gemini == ["weird tingling in my toes"]
+    assert second[0] == first[0]
+    assert set(second[1]["outputs"].items()) == set(first[1]["outputs"].items())
@@ -0,0 +1,168 @@
+import asyncio
+import copy
+import socket
+from datetime import datetime, timezone, timedelta
+
+import pytest
+from aiosmtpd.controller import Controller
+from bson import ObjectId
+
+from database import mongo
+from utils import mailer
+
+BAD_ADDRESS = "bounce@example.com"
+
+
+class Sink:
+    # Accepts everything except BAD_ADDRESS and records which connection
+    # (client address and port) each message arrived on.
+    def __init__(self):
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == BAD_ADDRESS:
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((session.peer, envelope.rcpt_tos[0]))
+        return "250 Message accepted"
+
+
+class Result:
+    def __init__(self, matched: int):
+        self.matched_count = matched
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    for key, cond in query.items():
+        if key == "$or":
+            if not any(_matches(doc, sub) for sub in cond):
+                return False
+        elif isinstance(cond, dict) and "$lte" in cond:
+            if key not in doc or doc[key] > cond["$lte"]:
+                return False
+        elif isinstance(cond, dict) and "$in" in cond:
+            if doc.get(key) not in cond["$in"]:
+                return False
+        elif doc.get(key) != cond:
+            return False
+    return True
+
+
+def _apply(doc: dict, update: dict):
+    doc.update(update.get("$set", {}))
+    for key in update.get("$unset", {}):
+        doc.pop(key, None)
+
+
+class FakeOutbox:
+    # Just the operations utils/mailer.py issues against email_outbox.
+    def __init__(self):
+        self.docs: dict = {}
+
+    async def insert_one(self, doc, session=None):
+        doc["_id"] = ObjectId()
+        self.docs[doc["_id"]] = copy.deepcopy(doc)
+
+    async def find_one_and_update(self, query, update, sort=None, return_document=None):
+        due = sorted((d for d in self.docs.values() if _matches(d, query)), key=lambda d: d["nextAttemptAt"])
+        if not due:
+            return None
+        _apply(due[0], update)
+        return copy.deepcopy(due[0])
+
+    async def update_one(self, query, update):
+        for doc in self.docs.values():
+            if _matches(doc, query):
+                _apply(doc, update)
+                return Result(1)
+        return Result(0)
+
+    async def count_documents(self, query):
+        return sum(_matches(d, query) for d in self.docs.values())
+
+
+def _freePort() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    sink = Sink()
+    port = _freePort()
+    controller = Controller(sink, hostname="127.0.0.1", port=port)
+    controller.start()
+    outbox = FakeOutbox()
+    monkeypatch.setattr(mongo, "outbox", lambda: outbox)
+    monkeypatch.setattr(mailer, "SMTP_SERVER", "127.0.0.1")
+    monkeypatch.setattr(mailer, "SMTP_PORT", port)
+    monkeypatch.setattr(mailer, "SMTP_SSL", False)
+    monkeypatch.setattr(mailer, "SMTP_PASSWORD", None)
+    monkeypatch.setattr(mailer, "stats", {key: 0 for key in mailer.stats})
+    yield sink, outbox
+    mailer._disconnect()
+    controller.stop()
+
+
+def testBatchUsesOneConnection(smtp):
+    sink, outbox = smtp
+
+    async def run():
+        for i in range(5):
+            await mailer.enqueue(f"user{i}@example.com", "Hi", "<p>hi</p>")
+        return await mailer.processBatch()
+
+    assert asyncio.run(run()) == 5
+    assert len(sink.messages) == 5
+    assert len({peer for peer, _ in sink.messages}) == 1
+    assert mailer.stats["connects"] == 1
+    assert {d["status"] for d in outbox.docs.values()} == {"sent"}
+
+
+def testFailuresBackOffThenGiveUp(smtp, monkeypatch):
+    sink, outbox = smtp
+    monkeypatch.setattr(mailer, "OUTBOX_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(mailer, "OUTBOX_BACKOFF_SECONDS", 10)
+
+    async def run():
+        await mailer.enqueue(BAD_ADDRESS, "Hi", "<p>hi</p>")
+        [doc] = outbox.docs.values()
+        delays = []
+        for _ in range(mailer.OUTBOX_MAX_ATTEMPTS):
+            before = datetime.now(timezone.utc)
+            assert await mailer.processBatch() == 1
+            if doc["status"] == "pending":
+                delays.append((doc["nextAttemptAt"] - before).total_seconds())
+                # Not due yet: a second pass must leave it alone.
+                assert await mailer.processBatch() == 0
+                doc["nextAttemptAt"] = before - timedelta(seconds=1)
+        return doc, delays
+
+    doc, delays = asyncio.run(run())
+    assert sink.messages == []
+    assert doc["status"] == "failed"
+    assert doc["attempts"] == 3
+    assert "claim" not in doc and "leaseUntil" not in doc
+    assert [round(d) for d in delays] == [10, 20]
+    assert mailer.stats["retried"] == 2 and mailer.stats["failed"] == 1
+
+
+def testLostLeaseIsNotSentTwice(smtp):
+    sink, outbox = smtp
+
+    async def run():
+        await mailer.enqueue("late@example.com", "Hi", "<p>hi</p>")
+        batch = await mailer._claimBatch("first")
+        # The lease lapses and another worker claims and sends it.
+        [doc] = outbox.docs.values()
+        doc["leaseUntil"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+        assert await mailer.processBatch() == 1
+        # The first worker finally gets to it and must back off.
+        return await mailer._renewLease(batch[0], "first")
+
+    assert asyncio.run(run()) is False
+    assert len(sink.messages) == 1
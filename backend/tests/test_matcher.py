@@ -0,0 +1,31 @@
+import pytest
+
+from utils import classification, matcher
+
+THRESHOLD = classification.CLASSIFIER_THRESHOLD
+
+
+@pytest.mark.parametrize("text", [
+    "heart burn",
+    "cold sores",
+    "cold hands",
+    "chest pain",
+    "pain due to period",
+])
+def testPartialAliasFallsToLLM(text):
+    # One alias inside a longer symptom must not be answered locally.
+    label, confidence = matcher.classify(text)
+    assert confidence < THRESHOLD, (text, label, confidence)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("heartburn", "Antacid"),
+    ("period pain", "Antispasmodic"),
+    ("I have a headache", "Analgesic"),
+    ("severe back pain", "Analgesic"),
+    ("dry coughs", "Antitussive"),
+])
+def testCoveredSymptomsResolveLocally(text, expected):
+    label, confidence = matcher.classify(text)
+    assert label == expected
+    assert confidence >= THRESHOLD
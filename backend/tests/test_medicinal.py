@@ -0,0 +1,95 @@
+import asyncio
+import http.server
+import os
+import threading
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import pytest
+
+from utils import medicinal
+from utils.cache import LRUCache
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "pfaf")
+
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    # Stands in for pfaf.org: LatinName=Mentha+piperita -> Mentha_piperita.html
+    hits: list[str] = []
+
+    def do_GET(self):
+        name = parse_qs(urlparse(self.path).query)["LatinName"][0]
+        self.hits.append(name)
+        path = os.path.join(FIXTURES, name.replace(" ", "_") + ".html")
+        if not os.path.exists(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeStore:
+    def __init__(self):
+        self.docs = {}
+
+    async def replace_one(self, query, doc, upsert=False):
+        self.docs[query["_id"]] = doc
+
+    async def find_one(self, query):
+        doc = self.docs.get(query["_id"])
+        return {"_id": query["_id"], **doc} if doc else None
+
+
+@pytest.fixture
+def pfaf(monkeypatch):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    store = FakeStore()
+    FixtureHandler.hits = []
+    monkeypatch.setattr(medicinal, "PFAF_BASE_URL", f"http://127.0.0.1:{server.server_port}/user/Plant.aspx")
+    monkeypatch.setattr(medicinal, "_collection", lambda: store)
+    monkeypatch.setattr(medicinal, "_local", LRUCache(maxsize=16, ttl=3600))
+    yield FixtureHandler.hits
+    server.shutdown()
+    server.server_close()
+
+
+def lookup(*names: str) -> list[str]:
+    async def run():
+        try:
+            return [await medicinal.getMedicinalUses(name) for name in names]
+        finally:
+            await medicinal.closeClient()
+    return asyncio.run(run())
+
+
+def testNestedSpan(pfaf):
+    [text] = lookup("Mentha piperita")
+    assert text == "Peppermint is antispasmodic and carminative. [4] The tea eases indigestion & colic."
+
+
+def testSingleQuotedId(pfaf):
+    assert lookup("Matricaria chamomilla") == ["Chamomile is a mild sedative."]
+
+
+def testHeadingFallback(pfaf):
+    assert lookup("Salvia officinalis") == ["Sage is used as a gargle for sore throats."]
+
+
+def testCachedAfterFirstFetch(pfaf):
+    first, second = lookup("Mentha piperita", "Mentha piperita")
+    assert first == second
+    assert pfaf == ["Mentha piperita"]
+
+
+def testMissingPlant(pfaf):
+    with pytest.raises(httpx.HTTPStatusError):
+        lookup("Nonexistent plant")
@@ -0,0 +1,138 @@
+import io
+import re
+
+import pytest
+from pypdf import PdfReader
+
+from utils import fastpdf, pdf
+
+RECIPE = {
+    "title": "Chamomile & Honey Tea",
+    "ingredients": ["1 tbsp dried chamomile flowers", "250 ml boiling water", "1 tsp honey"],
+    "instructions": "Steep the chamomile in the water for five minutes.\nStrain, stir in the honey and drink warm.",
+}
+FOOTER = "Generated by Elara AI using Google Gemini"
+# Points; about one body line, so a block may shift a little but not move.
+POSITION_TOLERANCE = 24
+
+
+def _read(data: bytes) -> PdfReader:
+    return PdfReader(io.BytesIO(data), strict=True)
+
+
+def _words(reader: PdfReader) -> list[str]:
+    text = " ".join(page.extract_text() for page in reader.pages)
+    return re.findall(r"[A-Za-z0-9']+", text)
+
+
+def _weasyprint():
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError):
+        pytest.skip("WeasyPrint's system libraries (pango) are not installed")
+
+
+def testFastEngineIsStrictlyValid():
+    data, _ = pdf._render(RECIPE, "fast")
+    reader = _read(data)
+    assert reader.metadata.title == RECIPE["title"]
+    words = _words(reader)
+    for ingredient in RECIPE["ingredients"]:
+        assert " ".join(re.findall(r"[A-Za-z0-9']+", ingredient)) in " ".join(words)
+
+
+def testCookbookIsStrictlyValid():
+    document = fastpdf.Document("Cookbook")
+    chunks = [document.start()]
+    pages = 0
+    for i in range(3):
+        rendered = fastpdf.renderPages({**RECIPE, "title": f"Recipe {i}"})
+        pages += len(rendered)
+        chunks.append(document.addPages(rendered))
+    chunks.append(document.finish())
+
+    reader = _read(b"".join(chunks))
+    assert len(reader.pages) == pages
+    assert [w for w in _words(reader) if w == "Recipe"] == ["Recipe"] * 3
+
+
+def _withoutFooter(words: list[str]) -> list[str]:
+    # Both engines draw the footer on every page; pypdf may extract it before
+    # or after the body depending on drawing order, so drop it wherever it is.
+    footer = FOOTER.split()
+    out, i = [], 0
+    while i < len(words):
+        if words[i:i + len(footer)] == footer:
+            i += len(footer)
+            continue
+        out.append(words[i])
+        i += 1
+    return out
+
+
+def _anchors(reader: PdfReader, recipe: dict) -> list[tuple[int, float, float]]:
+    # Page and baseline origin of the first fragment starting with the first
+    # word of the title, each heading, each ingredient and the instructions,
+    # in reading order.
+    fragments = []
+    for number, page in enumerate(reader.pages):
+        def visit(text, cm, tm, fontDict, fontSize, number=number):
+            if text.strip():
+                x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+                y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+                fragments.append((number, x, y, text.strip()))
+        page.extract_text(visitor_text=visit)
+
+    wanted = [recipe["title"], "Ingredients", *recipe["ingredients"], "Instructions", recipe["instructions"]]
+    found, start = [], 0
+    for anchor in wanted:
+        first = anchor.split()[0]
+        for i in range(start, len(fragments)):
+            if fragments[i][3].startswith(first):
+                found.append(fragments[i][:3])
+                start = i + 1
+                break
+        else:
+            raise AssertionError(f"{anchor!r} not found in {[f[3] for f in fragments]}")
+    return found
+
+
+def testFastLayoutFollowsReadingOrder():
+    reader = _read(pdf._render(RECIPE, "fast")[0])
+    anchors = _anchors(reader, RECIPE)
+    ys = [y for _, _, y in anchors]
+    assert ys == sorted(ys, reverse=True)
+    # Title centred, body on the left margin.
+    titleWidth = fastpdf.loadFont().width(RECIPE["title"], fastpdf.TITLE_SIZE)
+    assert abs(anchors[0][1] + titleWidth / 2 - fastpdf.PAGE_W / 2) < 1
+    assert all(abs(x - fastpdf.LEFT) < 20 for _, x, _ in anchors[1:])
+
+
+def testEnginesAgree():
+    # Stands in for a visual diff: same page count, the same words in the
+    # same order, and every block starting on the same page at roughly the
+    # same place.
+    _weasyprint()
+    fast = _read(pdf._render(RECIPE, "fast")[0])
+    weasy = _read(pdf._render(RECIPE, "weasyprint")[0])
+
+    assert len(fast.pages) == len(weasy.pages)
+    assert _withoutFooter(_words(fast)) == _withoutFooter(_words(weasy))
+
+    for (fastPage, fastX, fastY), (weasyPage, weasyX, weasyY) in zip(_anchors(fast, RECIPE), _anchors(weasy, RECIPE)):
+        assert fastPage == weasyPage
+        assert abs(fastX - weasyX) <= POSITION_TOLERANCE
+        assert abs(fastY - weasyY) <= POSITION_TOLERANCE
+
+
+def testFastEngineIsTenTimesFaster():
+    # The reason the fast engine exists; compared on warm workers, as the
+    # pool would run them.
+    _weasyprint()
+    pdf._render(RECIPE, "weasyprint")
+    pdf._render(RECIPE, "fast")
+
+    def best(engine: str) -> float:
+        return min(pdf._render(RECIPE, engine)[1] for _ in range(5))
+
+    assert best("weasyprint") >= 10 * best("fast")
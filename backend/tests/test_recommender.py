@@ -0,0 +1,25 @@
+import asyncio
+
+from utils import metrics, recommender
+
+
+class SlowPlants:
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    async def aggregate(self, pipeline, **kwargs):
+        await asyncio.sleep(self.delay)
+        raise AssertionError("the timeout should have fired first")
+
+
+def testBatchedQueryTimesOutWithNoPlants(monkeypatch):
+    monkeypatch.setattr(recommender, "_snapshot", None)
+    monkeypatch.setattr(recommender, "QUERY_MODE", "batched")
+    monkeypatch.setattr(recommender, "SYMPTOM_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(recommender.mongo, "plants", lambda: SlowPlants(5))
+    before = metrics.symptomTimeouts._value.get()
+
+    result = asyncio.run(recommender.bestPlant({"headache": "Headache", "migraine": "Headache", "cough": "Cough"}))
+
+    assert result == {"headache": [], "migraine": [], "cough": []}
+    assert metrics.symptomTimeouts._value.get() - before == 3
@@ -0,0 +1,16 @@
+from utils.symptoms import canonicalConcern
+
+
+def testFillerIsDropped():
+    assert canonicalConcern("I have a headache") == "headache"
+    assert canonicalConcern("headache!!") == "headache"
+
+
+def testContentWordsSurvive():
+    assert canonicalConcern("I have bad breath") == "bad breath"
+    assert canonicalConcern("I feel bad") == "bad"
+
+
+def testAllFillerIsNotEmpty():
+    assert canonicalConcern("I am feeling very") == "i am feeling very"
+    assert canonicalConcern("I have some") != canonicalConcern("I am feeling very")
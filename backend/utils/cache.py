@@ -0,0 +1,133 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+
+from database import mongo
+
+# Every cache registers itself here so /stats/cache can report all of them.
+caches: dict[str, "TieredCache"] = {}
+
+
+def makeKey(*parts) -> str:
+    normalized = [" ".join(str(p).lower().split()) for p in parts]
+    return hashlib.sha256(json.dumps(normalized).encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, object]] = OrderedDict()
+
+    def get(self, key: str):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value, ttl: float | None = None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+# In-process LRU in front of a Mongo collection shared by every instance.
+class TieredCache:
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.ttl = ttl
+        self.local = LRUCache(maxsize, ttl)
+        self.stats = {"localHits": 0, "sharedHits": 0, "misses": 0}
+        self._indexed = False
+        caches[name] = self
+
+    async def coll(self):
+        coll = mongo.cacheCollection(self.name)
+        if not self._indexed:
+            await coll.create_index([("expiresAt", 1)], expireAfterSeconds=0)
+            self._indexed = True
+        return coll
+
+    async def get(self, key: str):
+        value = self.local.get(key)
+        if value is not None:
+            self.stats["localHits"] += 1
+            return value
+
+        try:
+            coll = await self.coll()
+            doc = await coll.find_one(
+                {"_id": key, "expiresAt": {"$gt": datetime.now(timezone.utc)}}
+            )
+        except Exception as e:
+            print(f"Cache {self.name} lookup failed: {e}")
+            doc = None
+
+        if doc is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["sharedHits"] += 1
+        self.local.set(key, doc["value"])
+        return doc["value"]
+
+    async def getMany(self, keys: list[str]) -> dict:
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(key)
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+        self.stats["localHits"] += len(found)
+        if not missing:
+            return found
+
+        try:
+            coll = await self.coll()
+            docs = await coll.find({
+                "_id": {"$in": missing},
+                "expiresAt": {"$gt": datetime.now(timezone.utc)}
+            }).to_list()
+        except Exception as e:
+            print(f"Cache {self.name} lookup failed: {e}")
+            docs = []
+
+        for doc in docs:
+            self.local.set(doc["_id"], doc["value"])
+            found[doc["_id"]] = doc["value"]
+        self.stats["sharedHits"] += len(docs)
+        self.stats["misses"] += len(missing) - len(docs)
+        return found
+
+    async def set(self, key: str, value):
+        self.local.set(key, value)
+        try:
+            coll = await self.coll()
+            await coll.replace_one(
+                {"_id": key},
+                {"value": value, "expiresAt": datetime.now(timezone.utc) + timedelta(seconds=self.ttl)},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Cache {self.name} write failed: {e}")
+
+    def report(self) -> dict:
+        lookups = sum(self.stats.values())
+        hits = self.stats["localHits"] + self.stats["sharedHits"]
+        return {**self.stats, "size": len(self.local), "hitRate": hits / lookups if lookups else 0.0}
+
+
+def report() -> dict:
+    return {name: cache.report() for name, cache in caches.items()}
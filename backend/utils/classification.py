@@ -1,33 +1,28 @@
-from google import genai
 from google.genai import types
 import json
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+from utils.vertex import generateContent
+from utils.cache import TieredCache, makeKey
+from utils import matcher
 
-def classifyCondition(symptoms_dict: dict[str, str]) -> dict:
-  client = genai.Client(
-      vertexai=True,
-      project = os.environ.get("PROJECT"),
-      location="global",
-  )
-
-  symptoms_with_context = []
-  for symptom, context in symptoms_dict.items():
-        if context and context.strip():
-            symptoms_with_context.append(f"{symptom} due to {context}")
-        else:
-            symptoms_with_context.append(symptom)
+# "llm" sends every symptom to Gemini, "local" never does, "hybrid" only
+# sends the ones the local matcher is unsure about.
+CLASSIFIER_MODE = os.getenv("CLASSIFIER_MODE", "hybrid")
+CLASSIFIER_THRESHOLD = float(os.getenv("CLASSIFIER_THRESHOLD", "0.75"))
 
-    # 2. Wrap the list in the expected JSON shape: { "inputs": [ … ] }
-  user_payload = {"inputs": symptoms_with_context}
-  user_payload_text = json.dumps(user_payload)
+# Bump whenever the prompt or MEDICAL_USES changes.
+PROMPT_VERSION = "1"
 
-    # 3. System prompt remains the same dictionary of medical uses
-  si_text1 = """You are a highly accurate medical-use classification assistant. You have access to the following dictionary of botanical medical uses and their descriptions:
+# Keyed per symptom-with-context string so "headache" is reused across
+# "headache and nausea" and "headache and fever".
+classifyCache = TieredCache(
+    "classify_cache",
+    maxsize=int(os.getenv("QUERY_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("QUERY_CACHE_TTL", str(30 * 24 * 3600)))
+)
 
-{
+MEDICAL_USES = {
  "Abortifacient": "Causes an abortion.",
  "Acrid": "Causes heat and irritation when applied to the skin.",
  "Adaptogen": "Helps the body 'rise' to normal stress situations, thus preventing the many chronic degenerative diseases.",
@@ -162,6 +157,12 @@ def classifyCondition(symptoms_dict: dict[str, str]) -> dict:
  "Warts": "Used in the treatment of warts, corns etc.",
  "Women's complaints": "A very vague title, it deals with a miscellany of problems peculiar to the female sex."
 }
+
+matcher.load(MEDICAL_USES)
+
+si_text1 = """You are a highly accurate medical-use classification assistant. You have access to the following dictionary of botanical medical uses and their descriptions:
+
+""" + json.dumps(MEDICAL_USES, indent=1, ensure_ascii=False) + """
 INSTRUCTION:
 • The user will send you a JSON object with a single key, "inputs", whose value is an array of symptom strings (already including context).
 • Your job is to return ONLY a JSON object with a single key, "outputs", whose value is a dictionary mapping each symptom string exactly to the best matching medical-use classification from the dictionary above.
@@ -181,6 +182,66 @@ Your response MUST be:
 }
 """
 
+def symptomStrings(symptoms_dict: dict[str, str]) -> list[str]:
+  symptoms_with_context = []
+  for symptom, context in symptoms_dict.items():
+        if context and context.strip():
+            symptoms_with_context.append(f"{symptom} due to {context}")
+        else:
+            symptoms_with_context.append(symptom)
+  return symptoms_with_context
+
+async def classifyIter(symptoms_with_context: list[str]):
+  # Yields (symptom string, label) as each one resolves: local matches
+  # first, then shared-cache hits, then whatever Gemini returns.
+  unresolved = []
+  for text in symptoms_with_context:
+    if CLASSIFIER_MODE == "llm":
+      unresolved.append(text)
+      continue
+    label, confidence = matcher.classify(text)
+    if label and (confidence >= CLASSIFIER_THRESHOLD or CLASSIFIER_MODE == "local"):
+      matcher.stats["hits"] += 1
+      yield text, label
+    else:
+      unresolved.append(text)
+
+  if unresolved and CLASSIFIER_MODE == "local":
+    # Nothing matched at all; mirror the LLM and leave the symptom out.
+    matcher.stats["misses"] += len(unresolved)
+    unresolved = []
+
+  if unresolved:
+    keys = {text: makeKey(PROMPT_VERSION, matcher.normalize(text)) for text in unresolved}
+    cached = await classifyCache.getMany(list(keys.values()))
+    for text in unresolved:
+      if keys[text] in cached:
+        yield text, cached[keys[text]]
+    unresolved = [text for text in unresolved if keys[text] not in cached]
+
+  if unresolved:
+    if CLASSIFIER_MODE != "llm":
+      matcher.stats["fallbacks"] += len(unresolved)
+    llmOutputs = (await _classifyWithLLM(unresolved))["outputs"]
+    for text in unresolved:
+      if text in llmOutputs:
+        await classifyCache.set(keys[text], llmOutputs[text])
+    for text, label in llmOutputs.items():
+      yield text, label
+
+async def classifyCondition(symptoms_dict: dict[str, str]) -> dict:
+  symptoms_with_context = symptomStrings(symptoms_dict)
+  outputs = {text: label async for text, label in classifyIter(symptoms_with_context)}
+
+  ordered = {text: outputs[text] for text in symptoms_with_context if text in outputs}
+  ordered.update(outputs)
+  return {"outputs": ordered}
+
+async def _classifyWithLLM(symptoms_with_context: list[str]) -> dict:
+    # 2. Wrap the list in the expected JSON shape: { "inputs": [ … ] }
+  user_payload = {"inputs": symptoms_with_context}
+  user_payload_text = json.dumps(user_payload)
+
   model = "gemini-2.5-flash-preview-05-20"
   contents = [
     types.Content(
@@ -217,10 +278,11 @@ Your response MUST be:
     ),
   )
 
-  response = client.models.generate_content(
+  response = await generateContent(
     model=model,
     contents=contents,
-    config=generate_content_config
+    config=generate_content_config,
+    lane="classify"
   )
 
   return json.loads(response.text)
@@ -0,0 +1,293 @@
+import io
+import os
+import zlib
+from functools import lru_cache
+
+import pydyf
+
+# Draws the recipe layout from templates/recipe.html straight to PDF with
+# pydyf: no HTML parsing, no CSS cascade, no layout engine. Greedy word wrap
+# and page breaks are all the recipe needs.
+
+FONT_PATH = os.getenv(
+    "FAST_PDF_FONT",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "fonts", "Lato-Regular.ttf")
+)
+
+PAGE_W, PAGE_H = 595.28, 841.89          # A4 in points
+MARGIN = 28.35                           # 1cm
+LEFT = MARGIN * 2 + 24                   # page margin + overlay inset + padding
+RIGHT = PAGE_W - LEFT
+TOP = PAGE_H - MARGIN * 2 - 18
+BOTTOM = MARGIN * 2.5 + 18
+
+TITLE_SIZE, HEADING_SIZE, BODY_SIZE, FOOTER_SIZE = 30, 21, 12, 10
+FOOTER = "Generated by Elara AI using Google Gemini"
+
+BACKGROUND = (0.80, 0.94, 0.87)          # midpoint of the #d8f5e6 → #a8e9cb gradient
+OVERLAY = (0.87, 0.97, 0.92)
+TITLE_COLOR = (0.17, 0.24, 0.31)         # #2c3e50
+HEADING_COLOR = (0.20, 0.29, 0.37)       # #34495e
+TEXT_COLOR = (0.2, 0.2, 0.2)             # #333
+FOOTER_COLOR = (0.33, 0.33, 0.33)        # #555
+
+# Helvetica advance widths for WinAnsi 32..126, used when no font file is
+# bundled and we fall back to the non-embedded standard font.
+_HELVETICA = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+
+
+class _Font:
+    def __init__(self, path: str | None):
+        self.path = path if path and os.path.exists(path) else None
+        self.widths = [556] * 256
+        if self.path is None:
+            self.widths[32:127] = _HELVETICA
+            return
+
+        from fontTools.ttLib import TTFont
+        with open(self.path, "rb") as f:
+            self.program = f.read()
+        font = TTFont(io.BytesIO(self.program))
+        scale = 1000 / font["head"].unitsPerEm
+        cmap = font.getBestCmap()
+        hmtx = font["hmtx"]
+        for code in range(32, 256):
+            char = bytes([code]).decode("cp1252", errors="ignore")
+            glyph = cmap.get(ord(char)) if char else None
+            if glyph:
+                self.widths[code] = round(hmtx[glyph][0] * scale)
+        self.name = font["name"].getDebugName(6) or "EmbeddedFont"
+        self.ascent = round(font["hhea"].ascent * scale)
+        self.descent = round(font["hhea"].descent * scale)
+        head = font["head"]
+        self.bbox = [round(v * scale) for v in (head.xMin, head.yMin, head.xMax, head.yMax)]
+        # Deflate the font program once per process, not once per document.
+        self.compressed = zlib.compress(self.program, 9)
+
+    def encode(self, text: str) -> bytes:
+        return text.encode("cp1252", errors="replace")
+
+    def width(self, text: str, size: float) -> float:
+        return sum(self.widths[b] for b in self.encode(text)) * size / 1000
+
+    def objects(self, number: int) -> list[bytes]:
+        # Object bodies for the font, numbered from `number`; the font
+        # dictionary itself is always the first one.
+        font = pydyf.Dictionary({
+            "Type": "/Font",
+            "Subtype": "/Type1" if self.path is None else "/TrueType",
+            "BaseFont": "/Helvetica" if self.path is None else "/" + self.name.replace(" ", ""),
+            "Encoding": "/WinAnsiEncoding",
+        })
+        if self.path is None:
+            return [font.data]
+
+        program = pydyf.Stream([self.compressed], {"Length1": len(self.program), "Filter": "/FlateDecode"})
+        descriptor = pydyf.Dictionary({
+            "Type": "/FontDescriptor",
+            "FontName": font["BaseFont"],
+            "Flags": 32,
+            "FontBBox": pydyf.Array(self.bbox),
+            "ItalicAngle": 0,
+            "Ascent": self.ascent,
+            "Descent": self.descent,
+            "CapHeight": self.ascent,
+            "StemV": 80,
+            "FontFile2": f"{number + 2} 0 R",
+        })
+        font["FirstChar"] = 32
+        font["LastChar"] = 255
+        font["Widths"] = pydyf.Array(self.widths[32:256])
+        font["FontDescriptor"] = f"{number + 1} 0 R"
+        return [font.data, descriptor.data, program.data]
+
+
+@lru_cache(maxsize=4)
+def loadFont(path: str = FONT_PATH) -> _Font:
+    return _Font(path)
+
+
+def _wrap(font: _Font, text: str, size: float, width: float) -> list[str]:
+    lines = []
+    for paragraph in text.split("\n"):
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}" if line else word
+            if font.width(candidate, size) <= width:
+                line = candidate
+                continue
+            if line:
+                lines.append(line)
+            # A single word wider than the column is broken by characters.
+            while font.width(word, size) > width:
+                cut = len(word)
+                while cut > 1 and font.width(word[:cut], size) > width:
+                    cut -= 1
+                lines.append(word[:cut])
+                word = word[cut:]
+            line = word
+        lines.append(line)
+    return lines
+
+
+class _Writer:
+    def __init__(self, font: _Font):
+        self.font = font
+        self.pages: list[pydyf.Stream] = []
+        self.stream = None
+        self.y = 0.0
+
+    def newPage(self):
+        self.stream = pydyf.Stream(compress=True)
+        self.stream.set_color_rgb(*BACKGROUND)
+        self.stream.rectangle(0, 0, PAGE_W, PAGE_H)
+        self.stream.fill()
+        self.stream.set_color_rgb(*OVERLAY)
+        self.stream.rectangle(MARGIN * 2, MARGIN * 2.5, PAGE_W - MARGIN * 4, PAGE_H - MARGIN * 4.5)
+        self.stream.fill()
+        footerWidth = self.font.width(FOOTER, FOOTER_SIZE)
+        self.text(FOOTER, (PAGE_W - footerWidth) / 2, MARGIN, FOOTER_SIZE, FOOTER_COLOR)
+        self.pages.append(self.stream)
+        self.y = TOP
+
+    def text(self, line: str, x: float, y: float, size: float, color):
+        self.stream.set_color_rgb(*color)
+        self.stream.begin_text()
+        self.stream.set_font_size("F1", size)
+        self.stream.set_text_matrix(1, 0, 0, 1, round(x, 2), round(y, 2))
+        self.stream.show_text_string(self.font.encode(line))
+        self.stream.end_text()
+
+    def line(self, size: float, leading: float, color, x: float = LEFT, indent: float = 0, text: str = "") -> float:
+        if self.y - size < BOTTOM:
+            self.newPage()
+        self.y -= size
+        baseline = self.y
+        self.text(text, x + indent, baseline, size, color)
+        self.y -= size * (leading - 1)
+        return baseline
+
+    def heading(self, text: str):
+        if self.y - HEADING_SIZE * 3 < BOTTOM:
+            self.newPage()
+        self.y -= HEADING_SIZE * 0.8
+        self.line(HEADING_SIZE, 1.2, HEADING_COLOR, text=text)
+        self.stream.set_color_rgb(0.8, 0.8, 0.8, stroke=True)
+        self.stream.set_line_width(1.5)
+        self.stream.move_to(LEFT, self.y)
+        self.stream.line_to(RIGHT, self.y)
+        self.stream.stroke()
+        self.y -= 8
+
+
+def _drawRecipe(writer: _Writer, recipe: dict):
+    font = writer.font
+    for line in _wrap(font, recipe["title"], TITLE_SIZE, RIGHT - LEFT):
+        x = (PAGE_W - font.width(line, TITLE_SIZE)) / 2
+        writer.line(TITLE_SIZE, 1.2, TITLE_COLOR, x=x, text=line)
+
+    writer.heading("Ingredients")
+    bulletIndent = font.width("•  ", BODY_SIZE)
+    for item in recipe["ingredients"]:
+        for i, line in enumerate(_wrap(font, item, BODY_SIZE, RIGHT - LEFT - bulletIndent)):
+            baseline = writer.line(BODY_SIZE, 1.4, TEXT_COLOR, indent=bulletIndent, text=line)
+            if i == 0:
+                writer.text("•", LEFT, baseline, BODY_SIZE, TEXT_COLOR)
+
+    writer.heading("Instructions")
+    for line in _wrap(font, recipe["instructions"], BODY_SIZE, RIGHT - LEFT):
+        writer.line(BODY_SIZE, 1.6, TEXT_COLOR, text=line)
+
+
+class Document:
+    # Writes the PDF front to back so pages can be sent as soon as they are
+    # drawn. Only object offsets and page numbers stay in memory; the page
+    # tree, info and catalog go last and the xref points back at everything.
+    def __init__(self, title: str, fontPath: str = FONT_PATH):
+        self.title = title
+        self.font = loadFont(fontPath)
+        self.offsets: dict[int, int] = {}
+        self.position = 0
+        self.next = 4          # 1 catalog, 2 page tree, 3 info
+        self.kids: list[int] = []
+        self.fontNumber = 0
+
+    def _object(self, number: int, body: bytes) -> bytes:
+        chunk = b"%d 0 obj\n%s\nendobj\n" % (number, body)
+        self.offsets[number] = self.position
+        self.position += len(chunk)
+        return chunk
+
+    def _allocate(self, count: int = 1) -> int:
+        number = self.next
+        self.next += count
+        return number
+
+    def start(self) -> bytes:
+        header = b"%PDF-1.7\n%\xf0\x9f\x96\xa4\n"
+        self.position = len(header)
+        bodies = self.font.objects(self.next)
+        self.fontNumber = self._allocate(len(bodies))
+        return header + b"".join(self._object(self.fontNumber + i, body) for i, body in enumerate(bodies))
+
+    def addPages(self, pages: list[bytes]) -> bytes:
+        chunks = []
+        resources = pydyf.Dictionary({"Font": pydyf.Dictionary({"F1": f"{self.fontNumber} 0 R"})})
+        for content in pages:
+            contentNumber = self._allocate()
+            chunks.append(self._object(contentNumber, content))
+            page = pydyf.Dictionary({
+                "Type": "/Page",
+                "Parent": "2 0 R",
+                "MediaBox": pydyf.Array([0, 0, PAGE_W, PAGE_H]),
+                "Contents": f"{contentNumber} 0 R",
+                "Resources": resources,
+            })
+            pageNumber = self._allocate()
+            chunks.append(self._object(pageNumber, page.data))
+            self.kids.append(pageNumber)
+        return b"".join(chunks)
+
+    def finish(self) -> bytes:
+        tree = pydyf.Dictionary({
+            "Type": "/Pages",
+            "Kids": pydyf.Array(f"{kid} 0 R" for kid in self.kids),
+            "Count": len(self.kids),
+        })
+        info = pydyf.Dictionary({"Title": pydyf.String(self.title), "Producer": pydyf.String("Elara AI")})
+        catalog = pydyf.Dictionary({"Type": "/Catalog", "Pages": "2 0 R"})
+        body = self._object(2, tree.data) + self._object(3, info.data) + self._object(1, catalog.data)
+
+        xref = [b"xref\n0 %d\n0000000000 65535 f \n" % self.next]
+        xref += [b"%010d 00000 n \n" % self.offsets[number] for number in range(1, self.next)]
+        trailer = pydyf.Dictionary({"Size": self.next, "Root": "1 0 R", "Info": "3 0 R"})
+        return body + b"".join(xref) + b"trailer\n%s\nstartxref\n%d\n%%%%EOF\n" % (trailer.data, self.position)
+
+
+def renderPages(recipe: dict, fontPath: str = FONT_PATH) -> list[bytes]:
+    # Finished, compressed content streams for one recipe, ready for
+    # Document.addPages. Cheap to pickle back from a worker process.
+    writer = _Writer(loadFont(fontPath))
+    writer.newPage()
+    _drawRecipe(writer, recipe)
+    return [page.data for page in writer.pages]
+
+
+def renderRecipes(recipes: list[dict], fontPath: str = FONT_PATH) -> bytes:
+    document = Document(recipes[0]["title"] if len(recipes) == 1 else "Elara Cookbook", fontPath)
+    chunks = [document.start()]
+    for recipe in recipes:
+        chunks.append(document.addPages(renderPages(recipe, fontPath)))
+    chunks.append(document.finish())
+    return b"".join(chunks)
+
+
+def renderRecipe(recipe: dict, fontPath: str = FONT_PATH) -> bytes:
+    return renderRecipes([recipe], fontPath)
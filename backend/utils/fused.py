@@ -0,0 +1,152 @@
+from google.genai import types
+import json
+import re
+
+from utils.vertex import generateContent
+from utils.cache import makeKey
+from utils.classification import MEDICAL_USES, CLASSIFIER_MODE, CLASSIFIER_THRESHOLD, PROMPT_VERSION, classifyCache, classifyCondition
+from utils.symptoms import canonicalConcern, cacheKey, extractCache
+from utils import matcher
+
+_CLAUSES = re.compile(r"[,;.!?]|\b(?:and|plus|also|but)\b")
+
+si_text1 = """You are a focused symptom extractor and medical-use classifier. A user will describe how they feel using natural language. Your task is to:
+
+1. Identify each distinct symptom they mention.
+2. If the cause or context (e.g., "due to gas", "from stress", "because of period") is clear, include it, otherwise use "".
+3. Pick the single best matching medical-use classification for the symptom in its context from the dictionary below.
+
+""" + json.dumps(MEDICAL_USES, indent=1, ensure_ascii=False) + """
+
+Return ONLY a JSON object with one key, "findings", whose value is an array with one entry per symptom.
+
+Example:
+Input: "I have a stomach ache from gas and nausea due to my period."
+Output:
+{
+  "findings": [
+    {"symptom": "stomach ache", "context": "gas", "medicalUse": "Carminative"},
+    {"symptom": "nausea", "context": "menstrual cycle", "medicalUse": "Antiemetic"}
+  ]
+}
+Do not output anything except the JSON object.
+"""
+
+async def extractAndClassify(condition: str = "") -> tuple[dict, dict]:
+  contents = [
+        types.Content(
+            role="user",
+            parts=[types.Part.from_text(text=condition)]
+        )
+    ]
+
+  generate_content_config = types.GenerateContentConfig(
+        temperature=0.7,
+        top_p=1,
+        seed=0,
+        max_output_tokens=8192,
+        safety_settings=[
+            types.SafetySetting(category="HARM_CATEGORY_HATE_SPEECH", threshold="OFF"),
+            types.SafetySetting(category="HARM_CATEGORY_DANGEROUS_CONTENT", threshold="OFF"),
+            types.SafetySetting(category="HARM_CATEGORY_SEXUALLY_EXPLICIT", threshold="OFF"),
+            types.SafetySetting(category="HARM_CATEGORY_HARASSMENT", threshold="OFF"),
+        ],
+        response_mime_type="application/json",
+        response_schema={
+            "type": "OBJECT",
+            "properties": {
+                "findings": {
+                    "type": "ARRAY",
+                    "items": {
+                        "type": "OBJECT",
+                        "properties": {
+                            "symptom": {"type": "STRING"},
+                            "context": {"type": "STRING"},
+                            "medicalUse": {"type": "STRING", "enum": list(MEDICAL_USES)}
+                        },
+                        "required": ["symptom", "context", "medicalUse"]
+                    }
+                }
+            },
+            "required": ["findings"]
+        },
+        system_instruction=[types.Part.from_text(text=si_text1)],
+        thinking_config=types.ThinkingConfig(
+            thinking_budget=0,
+        ),
+    )
+
+  response = await generateContent(
+        model="gemini-2.5-flash-preview-05-20",
+        contents=contents,
+        config=generate_content_config,
+        lane="classify"
+    )
+
+  # Rebuild the exact shapes extract() and classifyCondition() return so
+  # bestPlant and the response model do not care which path ran.
+  symptoms = {}
+  outputs = {}
+  for finding in json.loads(response.text)["findings"]:
+    symptom = finding["symptom"]
+    context = finding.get("context") or ""
+    symptoms[symptom] = context
+    key = f"{symptom} due to {context}" if context.strip() else symptom
+    outputs[key] = finding["medicalUse"]
+
+  return {"symptoms": symptoms}, {"outputs": outputs}
+
+def localFindings(condition: str) -> tuple[dict, dict, list[str]]:
+  # Splits the concern into clauses and keeps those the local matcher is
+  # sure of; the rest are returned as written for Gemini.
+  symptoms = {}
+  outputs = {}
+  leftover = []
+  for clause in _CLAUSES.split(condition):
+    text = canonicalConcern(clause)
+    if not text:
+      continue
+    symptom, _, context = matcher.normalize(text).partition(" due to ")
+    key = f"{symptom} due to {context}" if context else symptom
+    label, confidence = matcher.classify(key)
+    if label and (confidence >= CLASSIFIER_THRESHOLD or CLASSIFIER_MODE == "local"):
+      symptoms[symptom] = context
+      outputs[key] = label
+    else:
+      leftover.append(clause.strip())
+  return symptoms, outputs, leftover
+
+async def analyzeFused(condition: str) -> tuple[dict, dict]:
+  # Cheapest first: a cached extraction is classified like the two-call path
+  # (matcher, then the classify cache); otherwise the matcher answers every
+  # clause it can and the fused call only sees what is left.
+  cached = await extractCache.get(cacheKey(condition))
+  if cached is not None:
+    return cached, await classifyCondition(cached["symptoms"])
+
+  if CLASSIFIER_MODE == "llm":
+    symptoms, outputs, leftover = {}, {}, [condition]
+  else:
+    symptoms, outputs, leftover = localFindings(condition)
+    matcher.stats["hits"] += len(outputs)
+  if not leftover:
+    return {"symptoms": symptoms}, {"outputs": outputs}
+  if CLASSIFIER_MODE == "local":
+    matcher.stats["misses"] += len(leftover)
+    return {"symptoms": symptoms}, {"outputs": outputs}
+
+  if CLASSIFIER_MODE != "llm":
+    matcher.stats["fallbacks"] += len(leftover)
+  # With nothing resolved locally Gemini gets the concern untouched, so no
+  # context is lost to the clause split.
+  question = ". ".join(leftover) if outputs else condition
+  rawSymptoms, rawClasses = await extractAndClassify(question)
+  symptoms.update(rawSymptoms["symptoms"])
+  outputs.update(rawClasses["outputs"])
+
+  # Seed both caches so a repeat of this concern, or any of these symptoms
+  # in another one, skips Gemini on either path.
+  await extractCache.set(cacheKey(condition), {"symptoms": symptoms})
+  for text, label in rawClasses["outputs"].items():
+    await classifyCache.set(makeKey(PROMPT_VERSION, matcher.normalize(text)), label)
+  return {"symptoms": symptoms}, {"outputs": outputs}
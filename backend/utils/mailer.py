@@ -0,0 +1,254 @@
+import asyncio
+import os
+import smtplib
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from pymongo import ReturnDocument
+
+from database import mongo
+from utils import metrics
+
+SMTP_SERVER = os.getenv("SMTP_SERVER", "mail.privateemail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_LOGIN = os.getenv("SMTP_LOGIN", "edward@edwardgaibor.me")
+SMTP_FROM = os.getenv("SMTP_FROM", "edward@edwardgaibor.me")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+# SMTP_SSL=0 talks plain SMTP, e.g. to `python -m aiosmtpd -n -l localhost:8025`.
+SMTP_SSL = os.getenv("SMTP_SSL", "1") == "1"
+# Close the warm connection after this long without mail; servers drop idle ones anyway.
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "60"))
+
+OUTBOX_BATCH = int(os.getenv("OUTBOX_BATCH", "20"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_BACKOFF_SECONDS", "10"))
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+# A message's lease is renewed right before it is sent, so it only has to
+# outlast one send: connect, login, a dropped warm connection and a retry.
+OUTBOX_LEASE_SECONDS = max(120, 8 * SMTP_TIMEOUT_SECONDS)
+
+FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
+
+stats = {"queued": 0, "sent": 0, "retried": 0, "failed": 0, "connects": 0}
+
+_smtp: smtplib.SMTP | None = None
+_lastUsed = 0.0
+_wake = asyncio.Event()
+_task: asyncio.Task | None = None
+
+
+def verificationMessage(email: str, username: str, token: str) -> tuple[str, str]:
+    verification_link = f"{FRONTEND_URL}/verify-email?token={token}&email={email}"
+    body = f"""
+        <html>
+        <body>
+            <h2>Welcome to Elara, {username}!</h2>
+            <p>Thank you for registering with Elara. To complete your registration, please verify your email address by clicking the link below:</p>
+            <p><a href="{verification_link}" style="background-color: #059669; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px;">Verify Email Address</a></p>
+            <p>If the button doesn't work, you can copy and paste this link into your browser:</p>
+            <p>{verification_link}</p>
+            <p>This link will expire in 24 hours.</p>
+            <p>If you didn't create an account with Elara, please ignore this email.</p>
+            <br>
+            <p>Best regards,<br>The Elara Team</p>
+        </body>
+        </html>
+        """
+    return "Verify Your Elara Account", body
+
+
+async def enqueue(to: str, subject: str, html: str, session=None):
+    # Durable before the request returns; the worker does the slow part.
+    # Inside a transaction, call wake() once it has committed.
+    now = datetime.now(timezone.utc)
+    await mongo.outbox().insert_one({
+        "to": to,
+        "subject": subject,
+        "html": html,
+        "status": "pending",
+        "attempts": 0,
+        "nextAttemptAt": now,
+        "createdAt": now,
+    }, session=session)
+    stats["queued"] += 1
+    if session is None:
+        wake()
+
+
+async def enqueueVerification(email: str, username: str, token: str, session=None):
+    subject, html = verificationMessage(email, username, token)
+    await enqueue(email, subject, html, session=session)
+
+
+def wake():
+    _wake.set()
+
+
+def _connect() -> smtplib.SMTP:
+    global _smtp
+    if SMTP_SSL:
+        _smtp = smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS)
+    else:
+        _smtp = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS)
+    if SMTP_PASSWORD:
+        _smtp.login(SMTP_LOGIN, SMTP_PASSWORD)
+    stats["connects"] += 1
+    return _smtp
+
+
+def _disconnect():
+    global _smtp
+    if _smtp is not None:
+        try:
+            _smtp.quit()
+        except Exception:
+            pass
+        _smtp = None
+
+
+def _sendOne(message: dict):
+    msg = MIMEMultipart()
+    msg['From'] = SMTP_FROM
+    msg['To'] = message["to"]
+    msg['Subject'] = message["subject"]
+    msg.attach(MIMEText(message["html"], 'html'))
+
+    try:
+        (_smtp or _connect()).sendmail(SMTP_FROM, message["to"], msg.as_string())
+    except smtplib.SMTPServerDisconnected:
+        # The warm connection timed out on the server side; one fresh try.
+        _disconnect()
+        _connect().sendmail(SMTP_FROM, message["to"], msg.as_string())
+
+
+def _send(message: dict) -> Exception | None:
+    # Runs in a worker thread: smtplib is blocking. The connection stays open
+    # between calls, so a batch goes out over one connection.
+    global _lastUsed
+    start = time.perf_counter()
+    try:
+        _sendOne(message)
+        metrics.smtpSeconds.labels("ok").observe(time.perf_counter() - start)
+        return None
+    except Exception as e:
+        metrics.smtpSeconds.labels("error").observe(time.perf_counter() - start)
+        if not isinstance(e, smtplib.SMTPRecipientsRefused):
+            _disconnect()
+        return e
+    finally:
+        _lastUsed = time.monotonic()
+
+
+async def _claimBatch(claim: str) -> list[dict]:
+    # Leased rather than deleted, so a crashed instance's messages come back.
+    # claim marks this worker's hold so it never writes over another's.
+    now = datetime.now(timezone.utc)
+    claimed = []
+    for _ in range(OUTBOX_BATCH):
+        doc = await mongo.outbox().find_one_and_update(
+            {"$or": [
+                {"status": "pending", "nextAttemptAt": {"$lte": now}},
+                {"status": "sending", "leaseUntil": {"$lte": now}},
+            ]},
+            {"$set": {"status": "sending", "claim": claim, "leaseUntil": now + timedelta(seconds=OUTBOX_LEASE_SECONDS)}},
+            sort=[("nextAttemptAt", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is None:
+            break
+        claimed.append(doc)
+    return claimed
+
+
+async def _renewLease(doc: dict, claim: str) -> bool:
+    # False when the lease ran out while earlier messages were sending and
+    # another worker has claimed this one; sending it too would duplicate it.
+    result = await mongo.outbox().update_one(
+        {"_id": doc["_id"], "status": "sending", "claim": claim},
+        {"$set": {"leaseUntil": datetime.now(timezone.utc) + timedelta(seconds=OUTBOX_LEASE_SECONDS)}}
+    )
+    return result.matched_count == 1
+
+
+async def _finish(doc: dict, error: Exception | None, claim: str):
+    now = datetime.now(timezone.utc)
+    if error is None:
+        stats["sent"] += 1
+        update = {"$set": {"status": "sent", "sentAt": now}, "$unset": {"leaseUntil": "", "lastError": "", "claim": ""}}
+    else:
+        attempts = doc.get("attempts", 0) + 1
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            stats["failed"] += 1
+            print(f"Giving up on email to {doc['to']} after {attempts} attempts: {error}")
+            update = {"$set": {"status": "failed", "attempts": attempts, "lastError": str(error)}, "$unset": {"leaseUntil": "", "claim": ""}}
+        else:
+            stats["retried"] += 1
+            delay = min(OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1), 3600)
+            update = {"$set": {
+                "status": "pending",
+                "attempts": attempts,
+                "nextAttemptAt": now + timedelta(seconds=delay),
+                "lastError": str(error),
+            }, "$unset": {"leaseUntil": "", "claim": ""}}
+    await mongo.outbox().update_one({"_id": doc["_id"], "claim": claim}, update)
+
+
+async def processBatch() -> int:
+    # Claims up to OUTBOX_BATCH due messages and sends them one by one,
+    # recording each result as soon as it is known.
+    claim = uuid.uuid4().hex
+    batch = await _claimBatch(claim)
+    for doc in batch:
+        if not await _renewLease(doc, claim):
+            continue
+        error = await asyncio.to_thread(_send, doc)
+        await _finish(doc, error, claim)
+    return len(batch)
+
+
+async def _run():
+    while True:
+        try:
+            # Cleared before claiming, so an enqueue during a send is not lost.
+            _wake.clear()
+            if await processBatch():
+                continue
+
+            if _smtp is not None and time.monotonic() - _lastUsed > SMTP_IDLE_SECONDS:
+                await asyncio.to_thread(_disconnect)
+            try:
+                await asyncio.wait_for(_wake.wait(), OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Email outbox worker error: {e}")
+            await asyncio.sleep(OUTBOX_POLL_SECONDS)
+
+
+def start():
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_run())
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    await asyncio.to_thread(_disconnect)
+
+
+async def report() -> dict:
+    pending = await mongo.outbox().count_documents({"status": {"$in": ["pending", "sending"]}})
+    return {**stats, "pending": pending, "connected": _smtp is not None}
@@ -0,0 +1,329 @@
+import math
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+# Hand-curated everyday phrasing -> PFAF medical-use label. The LLM prompt in
+# classification.py is still the source of truth for anything not covered here.
+ALIASES = {
+    "headache": "Analgesic",
+    "head ache": "Analgesic",
+    "migraine": "Analgesic",
+    "pain": "Analgesic",
+    "back pain": "Analgesic",
+    "body ache": "Analgesic",
+    "body aches": "Analgesic",
+    "muscle pain": "Analgesic",
+    "sore muscles": "Analgesic",
+    "toothache": "Odontalgic",
+    "tooth ache": "Odontalgic",
+    "sore gums": "Odontalgic",
+    "mouth ulcer": "Mouthwash",
+    "canker sore": "Mouthwash",
+    "bad breath": "Antihalitosis",
+    "halitosis": "Antihalitosis",
+    "sore throat": "Demulcent",
+    "scratchy throat": "Demulcent",
+    "hoarse voice": "Antiaphonic",
+    "lost voice": "Antiaphonic",
+    "loss of voice": "Antiaphonic",
+    "cough": "Antitussive",
+    "dry cough": "Antitussive",
+    "chesty cough": "Expectorant",
+    "phlegm": "Expectorant",
+    "mucus": "Expectorant",
+    "chest congestion": "Expectorant",
+    "congestion": "Decongestant",
+    "nasal congestion": "Decongestant",
+    "stuffy nose": "Decongestant",
+    "blocked nose": "Decongestant",
+    "runny nose": "Decongestant",
+    "sinus": "Decongestant",
+    "asthma": "Antiasthmatic",
+    "wheezing": "Antiasthmatic",
+    "bronchitis": "Pectoral",
+    "chest infection": "Pectoral",
+    "fever": "Febrifuge",
+    "high temperature": "Febrifuge",
+    "cold": "Diaphoretic",
+    "common cold": "Diaphoretic",
+    "flu": "Antiviral",
+    "influenza": "Antiviral",
+    "virus": "Antiviral",
+    "nausea": "Antiemetic",
+    "nauseous": "Antiemetic",
+    "vomiting": "Antiemetic",
+    "throwing up": "Antiemetic",
+    "morning sickness": "Antiemetic",
+    "motion sickness": "Antiemetic",
+    "nausea due to pregnancy": "Antiemetic",
+    "gas": "Carminative",
+    "bloating": "Carminative",
+    "bloated": "Carminative",
+    "flatulence": "Carminative",
+    "wind": "Carminative",
+    "stomach ache due to gas": "Carminative",
+    "stomach ache": "Stomachic",
+    "stomachache": "Stomachic",
+    "upset stomach": "Stomachic",
+    "indigestion": "Digestive",
+    "poor digestion": "Digestive",
+    "heartburn": "Antacid",
+    "acid reflux": "Antacid",
+    "reflux": "Antacid",
+    "constipation": "Laxative",
+    "constipated": "Laxative",
+    "diarrhea": "Astringent",
+    "diarrhoea": "Astringent",
+    "loss of appetite": "Appetizer",
+    "low appetite": "Appetizer",
+    "poor appetite": "Appetizer",
+    "worms": "Anthelmintic",
+    "intestinal worms": "Anthelmintic",
+    "parasites": "Vermifuge",
+    "hemorrhoids": "Antihaemorrhoidal",
+    "haemorrhoids": "Antihaemorrhoidal",
+    "piles": "Antihaemorrhoidal",
+    "insomnia": "Hypnotic",
+    "sleeplessness": "Hypnotic",
+    "trouble sleeping": "Hypnotic",
+    "can't sleep": "Hypnotic",
+    "anxiety": "Sedative",
+    "anxious": "Sedative",
+    "restlessness": "Sedative",
+    "stress": "Nervine",
+    "stressed": "Nervine",
+    "nervousness": "Nervine",
+    "depression": "Nervine",
+    "low mood": "Nervine",
+    "fatigue": "Tonic",
+    "tiredness": "Tonic",
+    "tired": "Tonic",
+    "exhaustion": "Tonic",
+    "weakness": "Tonic",
+    "cramps": "Antispasmodic",
+    "muscle cramps": "Antispasmodic",
+    "muscle spasms": "Antispasmodic",
+    "spasms": "Antispasmodic",
+    "menstrual cramps": "Antispasmodic",
+    "period cramps": "Antispasmodic",
+    "period pain": "Antispasmodic",
+    "irregular periods": "Emmenagogue",
+    "missed period": "Emmenagogue",
+    "arthritis": "Antiarthritic",
+    "rheumatism": "Antirheumatic",
+    "joint pain": "Antirheumatic",
+    "stiff joints": "Antirheumatic",
+    "inflammation": "Antiinflammatory",
+    "swelling": "Antiinflammatory",
+    "sprain": "Antiinflammatory",
+    "itching": "Antipruritic",
+    "itchy skin": "Antipruritic",
+    "itch": "Antipruritic",
+    "rash": "Antidermatosic",
+    "eczema": "Antidermatosic",
+    "psoriasis": "Antidermatosic",
+    "acne": "Skin",
+    "pimples": "Skin",
+    "dry skin": "Emollient",
+    "chapped lips": "Emollient",
+    "dandruff": "Antidandruff",
+    "fungal infection": "Antifungal",
+    "athlete's foot": "Antifungal",
+    "yeast infection": "Antifungal",
+    "thrush": "Antifungal",
+    "ringworm": "Parasiticide",
+    "lice": "Parasiticide",
+    "cut": "Vulnerary",
+    "cuts": "Vulnerary",
+    "wound": "Vulnerary",
+    "scrape": "Vulnerary",
+    "bruise": "Vulnerary",
+    "burn": "Poultice",
+    "burns": "Poultice",
+    "sunburn": "Poultice",
+    "insect bite": "Stings",
+    "bug bite": "Stings",
+    "mosquito bite": "Stings",
+    "bee sting": "Stings",
+    "sting": "Stings",
+    "wart": "Warts",
+    "corns": "Warts",
+    "bleeding": "Haemostatic",
+    "nosebleed": "Styptic",
+    "excessive sweating": "Antihydrotic",
+    "night sweats": "Antihydrotic",
+    "infection": "Antiseptic",
+    "bacterial infection": "Antibacterial",
+    "high blood pressure": "Hypotensive",
+    "hypertension": "Hypotensive",
+    "low blood pressure": "Vasoconstrictor",
+    "high cholesterol": "Anticholesterolemic",
+    "cholesterol": "Anticholesterolemic",
+    "high blood sugar": "Hypoglycaemic",
+    "diabetes": "Hypoglycaemic",
+    "palpitations": "Cardiotonic",
+    "heart problems": "Cardiac",
+    "kidney stones": "Lithontripic",
+    "gallstones": "Lithontripic",
+    "water retention": "Diuretic",
+    "urinary tract infection": "Diuretic",
+    "uti": "Diuretic",
+    "bed wetting": "Enuresis",
+    "liver problems": "Hepatic",
+    "hangover": "Antivinous",
+    "eye strain": "Ophthalmic",
+    "sore eyes": "Ophthalmic",
+    "pink eye": "Ophthalmic",
+    "conjunctivitis": "Ophthalmic",
+    "foot pain": "Foot care",
+    "sore feet": "Foot care",
+    "low milk supply": "Galactogogue",
+    "tuberculosis": "TB",
+    "scurvy": "Antiscorbutic",
+    "malaria": "Antiperiodic",
+}
+
+KEYWORD_CONFIDENCE = 0.9
+AMBIGUOUS_CONFIDENCE = 0.6
+DESCRIPTION_WEIGHT = 0.8
+
+stats = {"hits": 0, "fallbacks": 0, "misses": 0}
+
+_phrases: dict[str, str] = {}
+_maxPhraseWords = 1
+_docs: list[tuple[str, float]] = []
+_postings: dict[str, list[tuple[int, float]]] = defaultdict(list)
+_idf: dict[str, float] = {}
+
+# Words that carry no symptom on their own; everything else has to be covered
+# by an alias before a keyword match is trusted.
+_FILLER = {
+    "a", "an", "the", "i", "i'm", "im", "am", "is", "are", "my", "me", "have",
+    "has", "having", "got", "with", "of", "and", "in", "on", "at", "to", "due",
+    "very", "really", "so", "some", "slight", "mild", "severe", "constant",
+}
+
+_NONWORD = re.compile(r"[^a-z0-9' ]+")
+_CAUSE = re.compile(r"\b(?:because of|caused by|from)\b")
+
+
+def normalize(text: str) -> str:
+    text = _NONWORD.sub(" ", text.lower().replace("-", " "))
+    text = _CAUSE.sub("due to", text)
+    return " ".join(text.split())
+
+
+def _grams(text: str) -> Counter:
+    padded = f" {text} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _weigh(grams: Counter) -> dict[str, float]:
+    vec = {g: (1 + math.log(n)) * _idf[g] for g, n in grams.items() if g in _idf}
+    norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+    return {g: w / norm for g, w in vec.items()}
+
+
+def load(medicalUses: dict[str, str]):
+    global _maxPhraseWords
+    _phrases.clear()
+    _docs.clear()
+    _postings.clear()
+    _idf.clear()
+    _classify.cache_clear()
+
+    for label in medicalUses:
+        _phrases[normalize(label)] = label
+    for phrase, label in ALIASES.items():
+        if label in medicalUses:
+            _phrases[normalize(phrase)] = label
+    _maxPhraseWords = max(len(p.split()) for p in _phrases)
+
+    # Char-trigram TF-IDF over every phrase and description so typos and
+    # unseen wordings still land near the right label.
+    raw: list[Counter] = []
+    for phrase, label in _phrases.items():
+        _docs.append((label, 1.0))
+        raw.append(_grams(phrase))
+    for label, description in medicalUses.items():
+        if description:
+            _docs.append((label, DESCRIPTION_WEIGHT))
+            raw.append(_grams(normalize(description)))
+
+    df = Counter(g for grams in raw for g in grams)
+    for g, n in df.items():
+        _idf[g] = math.log((1 + len(raw)) / (1 + n)) + 1
+    for i, grams in enumerate(raw):
+        for g, w in _weigh(grams).items():
+            _postings[g].append((i, w))
+
+
+def _keywordMatches(text: str) -> tuple[Counter, float]:
+    # Longest phrases win; "period pain" should not also count as "pain".
+    # Also returns the share of non-filler words the phrases cover.
+    words = text.split()
+    used = [False] * len(words)
+    found: Counter = Counter()
+    for size in range(min(_maxPhraseWords, len(words)), 0, -1):
+        for start in range(len(words) - size + 1):
+            if any(used[start:start + size]):
+                continue
+            phrase = " ".join(words[start:start + size])
+            label = _phrases.get(phrase)
+            if label is None and phrase.endswith("s"):
+                label = _phrases.get(phrase[:-1])
+            if label:
+                found[label] += size
+                used[start:start + size] = [True] * size
+
+    content = [u for w, u in zip(words, used) if w not in _FILLER]
+    coverage = sum(content) / len(content) if content else 0.0
+    return found, coverage
+
+
+def _vectorMatch(text: str) -> tuple[str | None, float]:
+    scores: dict[int, float] = defaultdict(float)
+    for g, qw in _weigh(_grams(text)).items():
+        for doc, dw in _postings[g]:
+            scores[doc] += qw * dw
+
+    best: dict[str, float] = {}
+    for doc, score in scores.items():
+        label, weight = _docs[doc]
+        best[label] = max(best.get(label, 0.0), score * weight)
+    if not best:
+        return None, 0.0
+    label = max(best, key=best.get)
+    return label, best[label]
+
+
+@lru_cache(maxsize=4096)
+def _classify(text: str) -> tuple[str | None, float]:
+    if text in _phrases:
+        return _phrases[text], 1.0
+
+    # A lone alias inside a longer symptom ("burn" in "heart burn", "cold"
+    # in "cold sores") is only as trustworthy as the share it explains.
+    found, coverage = _keywordMatches(text)
+    if len(found) == 1:
+        return next(iter(found)), KEYWORD_CONFIDENCE * coverage
+    if found:
+        # Symptom and context point at different labels ("headache due to
+        # stress"); let the caller decide whether to ask the LLM.
+        return found.most_common(1)[0][0], AMBIGUOUS_CONFIDENCE * coverage
+
+    return _vectorMatch(text)
+
+
+def classify(text: str) -> tuple[str | None, float]:
+    return _classify(normalize(text))
+
+
+def rates() -> dict[str, float]:
+    total = sum(stats.values())
+    return {
+        **stats,
+        "hitRate": stats["hits"] / total if total else 0.0,
+        "fallbackRate": stats["fallbacks"] / total if total else 0.0,
+    }
@@ -0,0 +1,136 @@
+import asyncio
+import html
+import os
+import re
+from datetime import datetime, timezone, timedelta
+
+import httpx
+from bs4 import BeautifulSoup
+
+from database import mongo
+from utils.cache import LRUCache
+
+PFAF_BASE_URL = os.getenv("PFAF_BASE_URL", "https://pfaf.org/user/Plant.aspx")
+FRESH_SECONDS = float(os.getenv("MEDICINAL_FRESH_SECONDS", str(30 * 24 * 3600)))
+HTTP_TIMEOUT = float(os.getenv("PFAF_TIMEOUT_SECONDS", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("PFAF_MAX_CONNECTIONS", "20"))
+
+NOT_FOUND = "Medicinal Uses section not found."
+SPAN_ID = "ContentPlaceHolder1_txtMediUses"
+
+_http: httpx.AsyncClient | None = None
+# Short local TTL so instances pick up refreshes other instances wrote.
+_local = LRUCache(maxsize=int(os.getenv("MEDICINAL_CACHE_SIZE", "4096")), ttl=3600)
+# Background refreshes in flight, so a burst of stale hits fetches once.
+_refreshing: dict[str, asyncio.Task] = {}
+
+_SPAN_OPEN = re.compile(r"""<span[^>]*\bid\s*=\s*(["'])""" + SPAN_ID + r"""\1[^>]*>""", re.I)
+_SPAN_TAG = re.compile(r"<(/?)span\b[^>]*>", re.I)
+_TAG = re.compile(r"<[^>]+>")
+
+
+def startClient() -> httpx.AsyncClient:
+    global _http
+    if _http is None:
+        _http = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_TIMEOUT),
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS),
+            headers={"User-Agent": "python-requests"},
+            follow_redirects=True,
+        )
+    return _http
+
+
+async def closeClient():
+    global _http
+    for task in list(_refreshing.values()):
+        task.cancel()
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+
+def _collection():
+    return mongo.cacheCollection("medicinal_uses")
+
+
+def extractMedicinalUses(page: str) -> str:
+    # Slice out just the medicinal-uses span instead of parsing the whole page.
+    match = _SPAN_OPEN.search(page)
+    if match:
+        depth = 1
+        pos = match.end()
+        for tag in _SPAN_TAG.finditer(page, pos):
+            depth += -1 if tag.group(1) else 1
+            if depth == 0:
+                text = html.unescape(_TAG.sub(" ", page[pos:tag.start()]))
+                return " ".join(text.split())
+
+    # Markup the fast path cannot follow: let the parser find the span.
+    soup = BeautifulSoup(page, "html.parser")
+    span = soup.find("span", id=SPAN_ID)
+    if span:
+        return span.get_text(separator=" ", strip=True)
+
+    # Fallback: find the <h2> titled "Medicinal Uses" and grab the next <div>
+    h2 = soup.find("h2", string=lambda t: t and "Medicinal Uses" in t)
+    if h2:
+        div = h2.find_next_sibling("div")
+        if div:
+            return div.get_text(separator=" ", strip=True)
+
+    return NOT_FOUND
+
+
+async def fetchMedicinalUses(latin_name: str) -> str:
+    # Construct URL, replacing spaces with '+'
+    url = f"{PFAF_BASE_URL}?LatinName={latin_name.replace(' ', '+')}"
+    resp = await startClient().get(url)
+    resp.raise_for_status()
+    text = extractMedicinalUses(resp.text)
+
+    _local.set(latin_name, text)
+    await _collection().replace_one(
+        {"_id": latin_name},
+        {"text": text, "fetchedAt": datetime.now(timezone.utc)},
+        upsert=True
+    )
+    return text
+
+
+def _refreshInBackground(latin_name: str):
+    if latin_name in _refreshing:
+        return
+
+    async def refresh():
+        try:
+            await fetchMedicinalUses(latin_name)
+        except Exception as e:
+            print(f"Background refresh of medicinal uses for {latin_name} failed: {e}")
+        finally:
+            _refreshing.pop(latin_name, None)
+
+    _refreshing[latin_name] = asyncio.create_task(refresh())
+
+
+async def isFresh(latin_name: str) -> bool:
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=FRESH_SECONDS)
+    return await _collection().count_documents({"_id": latin_name, "fetchedAt": {"$gt": cutoff}}, limit=1) > 0
+
+
+async def getMedicinalUses(latin_name: str) -> str:
+    text = _local.get(latin_name)
+    if text is not None:
+        return text
+
+    doc = await _collection().find_one({"_id": latin_name})
+    if doc is None:
+        return await fetchMedicinalUses(latin_name)
+
+    # Stale-while-revalidate: answer from the store now, refetch behind it.
+    fetchedAt = doc["fetchedAt"].replace(tzinfo=timezone.utc)
+    if datetime.now(timezone.utc) - fetchedAt > timedelta(seconds=FRESH_SECONDS):
+        _refreshInBackground(latin_name)
+    else:
+        _local.set(latin_name, doc["text"])
+    return doc["text"]
@@ -0,0 +1,127 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from pymongo import monitoring
+
+# Prometheus metrics for /metrics. Observing a histogram is a lock and a few
+# adds, so everything here is cheap enough to sit on the request path.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+requestSeconds = Histogram(
+    "elara_http_request_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+stageSeconds = Histogram(
+    "elara_stage_seconds", "Recommendation pipeline stage latency",
+    ["stage"], buckets=LATENCY_BUCKETS
+)
+mongoSeconds = Histogram(
+    "elara_mongo_command_seconds", "MongoDB command latency",
+    ["collection", "command", "outcome"], buckets=LATENCY_BUCKETS
+)
+vertexSeconds = Histogram(
+    "elara_vertex_call_seconds", "Vertex AI generate_content latency",
+    ["model", "lane", "outcome"], buckets=LATENCY_BUCKETS
+)
+vertexTokens = Counter(
+    "elara_vertex_tokens", "Vertex AI tokens by direction",
+    ["model", "lane", "kind"]
+)
+smtpSeconds = Histogram(
+    "elara_smtp_send_seconds", "Time to hand one message to the SMTP server",
+    ["outcome"], buckets=LATENCY_BUCKETS
+)
+symptomTimeouts = Counter(
+    "elara_symptom_timeouts", "Per-symptom lookups that hit their timeout and returned partial results"
+)
+pdfSeconds = Histogram(
+    "elara_pdf_render_seconds", "PDF render time inside the worker",
+    ["engine"], buckets=LATENCY_BUCKETS
+)
+pdfWaitSeconds = Histogram(
+    "elara_pdf_queue_wait_seconds", "Time a PDF render waited for a worker",
+    ["engine"], buckets=LATENCY_BUCKETS
+)
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stageSeconds.labels(name).observe(time.perf_counter() - start)
+
+
+def observeVertex(model: str, lane: str, seconds: float, response=None):
+    outcome = "ok" if response is not None else "error"
+    vertexSeconds.labels(model, lane, outcome).observe(seconds)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for kind, count in (
+        ("prompt", usage.prompt_token_count),
+        ("output", usage.candidates_token_count),
+        ("thoughts", getattr(usage, "thoughts_token_count", None)),
+    ):
+        if count:
+            vertexTokens.labels(model, lane, kind).inc(count)
+
+
+class MongoListener(monitoring.CommandListener):
+    # Driver-level hook: every command on every collection, no call-site changes.
+    def __init__(self):
+        self._pending: dict[tuple, str] = {}
+
+    def started(self, event):
+        # getMore names its collection separately; its own value is a cursor id.
+        target = event.command.get("collection" if event.command_name == "getMore" else event.command_name)
+        collection = target if isinstance(target, str) else "-"
+        self._pending[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event, outcome: str):
+        collection = self._pending.pop((event.connection_id, event.request_id), "-")
+        mongoSeconds.labels(collection, event.command_name, outcome).observe(event.duration_micros / 1e6)
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
+
+mongoListener = MongoListener()
+
+
+class RequestMetrics:
+    # Plain ASGI middleware: cheaper than BaseHTTPMiddleware and it times
+    # streamed responses to their last byte. Routes are labelled by template
+    # (/deleteRecipe/{recipe_id}) so ids do not explode the label set.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+
+        async def sendWithStatus(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, sendWithStatus)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            requestSeconds.labels(scope["method"], path, str(status)).observe(time.perf_counter() - start)
+
+
+def exposition() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,50 @@
+import base64
+
+from bson import json_util
+from pymongo import DESCENDING
+
+# Keyset pagination: each page continues strictly after the last document of
+# the previous one, so a page costs the same however deep it is. The sort
+# must end in a unique field (_id) and be backed by an index in that order.
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encodeCursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decodeCursor(token: str, size: int) -> list:
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except Exception:
+        raise InvalidCursor("Malformed pagination cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("Pagination cursor does not match this listing")
+    return values
+
+
+def _afterFilter(sort: list[tuple[str, int]], values: list) -> dict:
+    # (a, b, c) after (x, y, z) in descending order:
+    # a < x  or  a = x and b < y  or  a = x and b = y and c < z
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {f: v for (f, _), v in zip(sort[:i], values[:i])}
+        clause[field] = {"$lt" if direction == DESCENDING else "$gt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+async def page(collection, query: dict, sort: list[tuple[str, int]], projection: dict, limit: int, after: str | None = None):
+    if after:
+        query = {"$and": [query, _afterFilter(sort, decodeCursor(after, len(sort)))]}
+
+    # One extra document says whether there is a next page without a count.
+    docs = await collection.find(query, projection).sort(sort).limit(limit + 1).to_list()
+    nextCursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        nextCursor = encodeCursor([docs[-1][field] for field, _ in sort])
+    return docs, nextCursor
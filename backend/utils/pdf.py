@@ -0,0 +1,253 @@
+import asyncio
+import collections
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.request import url2pathname
+from typing import AsyncIterator
+
+from utils import metrics
+from utils.cache import TieredCache, makeKey
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+# The only files a render may load; everything else, local or remote, is refused.
+FONT_DIR = os.path.realpath(os.path.join(os.path.dirname(TEMPLATE_DIR), "static", "fonts"))
+# Bump whenever recipe.html or recipe.css changes so cached PDFs are rebuilt.
+TEMPLATE_VERSION = "3"
+
+# "weasyprint" lays out templates/recipe.html; "fast" draws the same layout
+# directly with utils/fastpdf.py. Requests may pick either per call.
+PDF_ENGINE = os.getenv("PDF_ENGINE", "weasyprint")
+ENGINES = ("weasyprint", "fast")
+
+# cpu_count() is the host's inside a container; cap the default so a big
+# host does not spawn dozens of render processes.
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(os.cpu_count() or 1, 4))))
+PDF_MAX_QUEUE = int(os.getenv("PDF_MAX_QUEUE", "32"))
+
+pdfCache = TieredCache(
+    "pdf_cache",
+    maxsize=int(os.getenv("PDF_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("PDF_CACHE_TTL", str(7 * 24 * 3600)))
+)
+
+stats = {
+    "inFlight": 0,
+    "rendered": 0,
+    "renderedByEngine": {engine: 0 for engine in ENGINES},
+    "rejected": 0,
+    "renderSecondsTotal": 0.0,
+    "renderSecondsMax": 0.0,
+    "waitSecondsTotal": 0.0,
+}
+
+_pool: ProcessPoolExecutor | None = None
+
+
+class RendererBusy(Exception):
+    pass
+
+
+_template = None
+_stylesheet = None
+_fonts = None
+_fetcher = None
+
+
+def _initWorker():
+    # Only the fast engine's font is loaded up front; WeasyPrint needs pango
+    # and is set up on a worker's first WeasyPrint render instead, so the
+    # fast engine and cookbooks keep working where it is not installed.
+    from utils import fastpdf
+    fastpdf.loadFont()
+
+
+def _initWeasyPrint():
+    # Everything that does not depend on the recipe is built once per process:
+    # the compiled Jinja template, the parsed stylesheet and the font config.
+    global _template, _stylesheet, _fonts, _fetcher
+    from jinja2 import Environment, FileSystemLoader
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+    from weasyprint.urls import URLFetcher
+
+    class FontsOnly(URLFetcher):
+        def fetch(self, url, headers=None):
+            if url.startswith("file:"):
+                path = os.path.realpath(url2pathname(url.split("?")[0].removeprefix("file:")))
+                if path.startswith(FONT_DIR + os.sep):
+                    return super().fetch(url, headers)
+            raise ValueError(f"Resource not allowed in recipe PDFs: {url}")
+
+    _fetcher = FontsOnly()
+    _template = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=True).get_template("recipe.html")
+    _fonts = FontConfiguration()
+    _stylesheet = CSS(filename=os.path.join(TEMPLATE_DIR, "recipe.css"), font_config=_fonts, url_fetcher=_fetcher)
+
+
+def _render(recipe: dict, engine: str) -> tuple[bytes, float]:
+    if engine == "fast":
+        from utils import fastpdf
+        start = time.perf_counter()
+        return fastpdf.renderRecipe(recipe), time.perf_counter() - start
+
+    from weasyprint import HTML
+
+    if _template is None:
+        _initWeasyPrint()
+    start = time.perf_counter()
+    rendered_html = _template.render(recipe=recipe)
+    pdf = HTML(string=rendered_html, base_url=TEMPLATE_DIR, url_fetcher=_fetcher).write_pdf(
+        stylesheets=[_stylesheet],
+        font_config=_fonts
+    )
+    return pdf, time.perf_counter() - start
+
+
+def _renderPages(recipe: dict) -> tuple[list[bytes], float]:
+    from utils import fastpdf
+    start = time.perf_counter()
+    return fastpdf.renderPages(recipe), time.perf_counter() - start
+
+
+def startPool():
+    global _pool
+    if _pool is None:
+        # spawn, not fork: the parent already holds Mongo and HTTP sockets.
+        _pool = ProcessPoolExecutor(
+            max_workers=PDF_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_initWorker
+        )
+
+
+def _discardPool(pool: ProcessPoolExecutor):
+    # A worker died (e.g. OOM-killed mid-render) and the executor refuses all
+    # further work; drop it so the next request starts a fresh one.
+    global _pool
+    print("PDF render worker died; restarting the render pool")
+    if _pool is pool:
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def stopPool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def renderRecipe(recipe: dict, engine: str | None = None) -> bytes:
+    engine = engine or PDF_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown PDF engine: {engine}")
+
+    key = makeKey(TEMPLATE_VERSION, engine, json.dumps(recipe, sort_keys=True))
+    cached = await pdfCache.get(key)
+    if cached is not None:
+        return cached
+
+    startPool()
+    # Reject fast instead of letting requests pile up behind a saturated pool.
+    if stats["inFlight"] >= PDF_WORKERS + PDF_MAX_QUEUE:
+        stats["rejected"] += 1
+        raise RendererBusy()
+
+    enqueued = time.perf_counter()
+    stats["inFlight"] += 1
+    pool = _pool
+    try:
+        pdf, seconds = await asyncio.get_running_loop().run_in_executor(pool, _render, recipe, engine)
+    except BrokenProcessPool:
+        _discardPool(pool)
+        raise RendererBusy()
+    finally:
+        stats["inFlight"] -= 1
+
+    stats["rendered"] += 1
+    stats["renderedByEngine"][engine] += 1
+    stats["renderSecondsTotal"] += seconds
+    stats["renderSecondsMax"] = max(stats["renderSecondsMax"], seconds)
+    stats["waitSecondsTotal"] += time.perf_counter() - enqueued - seconds
+    metrics.pdfSeconds.labels(engine).observe(seconds)
+    metrics.pdfWaitSeconds.labels(engine).observe(max(0.0, time.perf_counter() - enqueued - seconds))
+
+    await pdfCache.set(key, pdf)
+    return pdf
+
+
+def renderCookbook(recipes: AsyncIterator[dict], title: str = "Elara Cookbook") -> AsyncIterator[bytes]:
+    # Checked eagerly so a saturated pool is a 503, not a broken stream.
+    startPool()
+    if stats["inFlight"] >= PDF_WORKERS + PDF_MAX_QUEUE:
+        stats["rejected"] += 1
+        raise RendererBusy()
+    return _cookbookChunks(recipes, title)
+
+
+async def _cookbookChunks(recipes: AsyncIterator[dict], title: str) -> AsyncIterator[bytes]:
+    # Always the fast engine: it hands back page fragments that can be
+    # appended to one document, which WeasyPrint output cannot. Recipes
+    # render in parallel but are written in order, with at most two per
+    # worker held in memory at once.
+    from utils import fastpdf
+
+    loop = asyncio.get_running_loop()
+    document = fastpdf.Document(title)
+    window = collections.deque()
+    pool = _pool
+
+    def submit(recipe: dict):
+        stats["inFlight"] += 1
+        future = loop.run_in_executor(pool, _renderPages, recipe)
+        future.add_done_callback(lambda _: stats.__setitem__("inFlight", stats["inFlight"] - 1))
+        window.append(future)
+
+    async def drain() -> bytes:
+        pages, seconds = await window.popleft()
+        stats["rendered"] += 1
+        stats["renderedByEngine"]["fast"] += 1
+        stats["renderSecondsTotal"] += seconds
+        stats["renderSecondsMax"] = max(stats["renderSecondsMax"], seconds)
+        metrics.pdfSeconds.labels("fast").observe(seconds)
+        return document.addPages(pages)
+
+    try:
+        yield document.start()
+        async for recipe in recipes:
+            submit(recipe)
+            if len(window) >= PDF_WORKERS * 2:
+                yield await drain()
+        while window:
+            yield await drain()
+        yield document.finish()
+    except BrokenProcessPool:
+        # Headers are already sent, so the download just ends short.
+        _discardPool(pool)
+        raise
+    finally:
+        # Client went away mid-download: drop renders that have not started.
+        for future in window:
+            future.cancel()
+
+
+def report() -> dict:
+    rendered = stats["rendered"]
+    return {
+        "engine": PDF_ENGINE,
+        "workers": PDF_WORKERS,
+        "maxQueue": PDF_MAX_QUEUE,
+        "inFlight": stats["inFlight"],
+        "queueDepth": max(0, stats["inFlight"] - PDF_WORKERS),
+        "rejected": stats["rejected"],
+        "rendered": rendered,
+        "renderedByEngine": dict(stats["renderedByEngine"]),
+        "renderSecondsMean": stats["renderSecondsTotal"] / rendered if rendered else 0.0,
+        "renderSecondsMax": stats["renderSecondsMax"],
+        "waitSecondsMean": stats["waitSecondsTotal"] / rendered if rendered else 0.0,
+        "cache": pdfCache.report(),
+    }
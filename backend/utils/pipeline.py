@@ -0,0 +1,130 @@
+import asyncio
+import os
+import time
+
+from utils.symptoms import extract
+from utils.classification import classifyCondition, classifyIter, symptomStrings
+from utils.recommender import bestPlant, SYMPTOM_TIMEOUT_SECONDS
+from utils.fused import extractAndClassify, analyzeFused
+from utils import metrics
+
+# "two-call" runs extract() then classifyCondition(), "fused" asks Gemini once
+# for both (after the caches and the local matcher), "compare" serves the
+# two-call result while also running the raw fused call so latency and label
+# agreement can be read off /stats/pipeline.
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "two-call")
+
+stats = {
+    "twoCall": {"calls": 0, "seconds": 0.0},
+    "fused": {"calls": 0, "seconds": 0.0},
+    "compared": 0,
+    "agreed": 0,
+}
+
+
+async def _timed(name: str, coro):
+    start = time.perf_counter()
+    result = await coro
+    seconds = time.perf_counter() - start
+    stats[name]["calls"] += 1
+    stats[name]["seconds"] += seconds
+    if name == "fused":
+        metrics.stageSeconds.labels("fused").observe(seconds)
+    return result
+
+
+async def _twoCall(medicalConcern: str) -> tuple[dict, dict]:
+    with metrics.stage("extract"):
+        rawSymptoms = await extract(medicalConcern)
+    with metrics.stage("classify"):
+        rawClasses = await classifyCondition(rawSymptoms["symptoms"])
+    return rawSymptoms, rawClasses
+
+
+async def analyze(medicalConcern: str) -> tuple[dict, dict]:
+    if PIPELINE_MODE == "fused":
+        return await _timed("fused", analyzeFused(medicalConcern))
+    if PIPELINE_MODE != "compare":
+        return await _timed("twoCall", _twoCall(medicalConcern))
+
+    twoCall, fused = await asyncio.gather(
+        _timed("twoCall", _twoCall(medicalConcern)),
+        _timed("fused", extractAndClassify(medicalConcern)),
+        return_exceptions=True
+    )
+    if isinstance(twoCall, BaseException):
+        raise twoCall
+    if isinstance(fused, BaseException):
+        print(f"Fused pipeline failed during comparison: {fused}")
+    else:
+        stats["compared"] += 1
+        if set(twoCall[1]["outputs"].values()) == set(fused[1]["outputs"].values()):
+            stats["agreed"] += 1
+    return twoCall
+
+
+async def _listed(pairs):
+    for pair in pairs:
+        yield pair
+
+
+async def analyzeStream(medicalConcern: str, edible: bool = False):
+    # Yields (event, data) for /getRecommendations/stream: the symptoms once
+    # extracted, each classification as it resolves, and each symptom's
+    # plants as soon as its lookup returns, in whatever order that happens.
+    if PIPELINE_MODE == "fused":
+        rawSymptoms, rawClasses = await _timed("fused", analyzeFused(medicalConcern))
+        classifications = _listed(rawClasses["outputs"].items())
+    else:
+        with metrics.stage("extract"):
+            rawSymptoms = await extract(medicalConcern)
+        classifications = classifyIter(symptomStrings(rawSymptoms["symptoms"]))
+    yield "symptoms", rawSymptoms["symptoms"]
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def lookup(text: str, label: str):
+        try:
+            plants = await asyncio.wait_for(bestPlant({text: label}, edible=edible), SYMPTOM_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            metrics.symptomTimeouts.inc()
+            await queue.put(("plants", {"symptom": text, "plants": [], "timedOut": True}))
+            return
+        await queue.put(("plants", {"symptom": text, "plants": plants.get(text, [])}))
+
+    async def classify():
+        lookups = []
+        try:
+            async for text, label in classifications:
+                await queue.put(("classification", {"symptom": text, "condition": label}))
+                lookups.append(asyncio.create_task(lookup(text, label)))
+            await asyncio.gather(*lookups)
+        except BaseException:
+            for task in lookups:
+                task.cancel()
+            raise
+        finally:
+            await queue.put(None)
+
+    producer = asyncio.create_task(classify())
+    try:
+        while (item := await queue.get()) is not None:
+            yield item
+        await producer
+    finally:
+        producer.cancel()
+
+
+def report() -> dict:
+    return {
+        "mode": PIPELINE_MODE,
+        **{
+            name: {
+                "calls": stats[name]["calls"],
+                "meanSeconds": stats[name]["seconds"] / stats[name]["calls"] if stats[name]["calls"] else 0.0,
+            }
+            for name in ("twoCall", "fused")
+        },
+        "compared": stats["compared"],
+        "agreementRate": stats["agreed"] / stats["compared"] if stats["compared"] else 0.0,
+    }
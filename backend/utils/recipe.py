@@ -1,18 +1,47 @@
-from google import genai
 from google.genai import types
 import json
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
-
-def getRecipe(commonName, scientificName, edibleUses):
-  client = genai.Client(
-      vertexai=True,
-      project = os.environ.get("PROJECT"),
-      location="global",
+from utils.vertex import generateContent, generateContentStream
+from utils.cache import TieredCache, makeKey
+
+# Bump whenever the prompt or generation config changes so stale recipes are
+# not served from the cache.
+PROMPT_VERSION = "1"
+
+recipeCache = TieredCache(
+    "recipe_cache",
+    maxsize=int(os.getenv("RECIPE_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("RECIPE_CACHE_TTL", str(7 * 24 * 3600)))
+)
+
+async def getRecipe(commonName, scientificName, edibleUses, fresh: bool = False, validate=None):
+  # validate() gets the parsed object and may raise; as in streamRecipe, only
+  # validated recipes are cached so one malformed reply is not replayed.
+  key = makeKey(PROMPT_VERSION, commonName, scientificName, edibleUses)
+  if not fresh:
+    cached = await recipeCache.get(key)
+    if cached is not None:
+      return cached
+
+  recipe = await _generateRecipe(commonName, scientificName, edibleUses)
+  if validate is not None:
+    recipe = validate(recipe)
+  await recipeCache.set(key, recipe)
+  return recipe
+
+async def _generateRecipe(commonName, scientificName, edibleUses):
+  model, contents, generate_content_config = _recipeRequest(commonName, scientificName, edibleUses)
+  response = await generateContent(
+    model=model,
+    contents=contents,
+    config=generate_content_config,
+    lane="recipe"
   )
 
+  return json.loads(response.text)
+
+def _recipeRequest(commonName, scientificName, edibleUses):
   si_text1 = """You are a recipe‐creation assistant. You will be given two variables:
 
 • scientific_name: a plant’s scientific name (string)
@@ -191,10 +220,119 @@ Expected output:
     ),
   )
 
-  response = client.models.generate_content(
-    model=model,
-    contents=contents,
-    config=generate_content_config
-  )
-
-  return json.loads(response.text)
\ No newline at end of file
+  return model, contents, generate_content_config
+
+class IncrementalJSON:
+  # Just enough of a streaming JSON scanner to report string values while
+  # they arrive: ("partial", path, text) for each new run of characters and
+  # ("string", path, value) once the closing quote is seen. Paths look like
+  # ("output", "ingredients", 2). The complete text is still json.loads'd.
+  _ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+
+  def __init__(self):
+    self.stack = []          # ["obj", key, expectingKey] or ["arr", index]
+    self.inString = False
+    self.isKey = False
+    self.escape = None
+    self.buf = []
+    self.sent = 0
+
+  def _path(self):
+    return tuple(frame[1] for frame in self.stack)
+
+  def _partial(self, events):
+    if not self.isKey and len(self.buf) > self.sent:
+      events.append(("partial", self._path(), "".join(self.buf[self.sent:])))
+      self.sent = len(self.buf)
+
+  def feed(self, text: str) -> list:
+    events = []
+    for ch in text:
+      if self.inString:
+        if self.escape is not None:
+          self.escape += ch
+          if self.escape[0] == "u":
+            if len(self.escape) < 5:
+              continue
+            ch = chr(int(self.escape[1:], 16))
+          else:
+            ch = self._ESCAPES.get(ch, ch)
+          self.escape = None
+          self.buf.append(ch)
+        elif ch == "\\":
+          self.escape = ""
+        elif ch == '"':
+          self.inString = False
+          value = "".join(self.buf)
+          if self.isKey:
+            self.stack[-1][1] = value
+          else:
+            self._partial(events)
+            events.append(("string", self._path(), value))
+        else:
+          self.buf.append(ch)
+        continue
+
+      if ch == '"':
+        self.inString = True
+        self.isKey = bool(self.stack) and self.stack[-1][0] == "obj" and self.stack[-1][2]
+        self.buf = []
+        self.sent = 0
+      elif ch == "{":
+        self.stack.append(["obj", None, True])
+      elif ch == "[":
+        self.stack.append(["arr", 0])
+      elif ch in "}]":
+        self.stack.pop()
+      elif ch == ":":
+        self.stack[-1][2] = False
+      elif ch == "," and self.stack:
+        if self.stack[-1][0] == "obj":
+          self.stack[-1][2] = True
+        else:
+          self.stack[-1][1] += 1
+
+    if self.inString:
+      self._partial(events)
+    return events
+
+def _recipeEvents(recipe: dict):
+  output = recipe["output"]
+  yield "recipeName", {"recipeName": output["recipeName"]}
+  for index, ingredient in enumerate(output["ingredients"]):
+    yield "ingredient", {"index": index, "ingredient": ingredient}
+  yield "instructions", {"delta": output["instructions"]}
+
+async def streamRecipe(commonName, scientificName, edibleUses, fresh: bool = False, validate=None):
+  # Yields (event, data): recipeName and each ingredient once complete,
+  # instructions as text deltas, then the whole recipe. validate() gets the
+  # parsed object and may raise; only validated recipes are cached.
+  key = makeKey(PROMPT_VERSION, commonName, scientificName, edibleUses)
+  if not fresh:
+    cached = await recipeCache.get(key)
+    if cached is not None:
+      for event in _recipeEvents(cached):
+        yield event
+      yield "recipe", cached
+      return
+
+  model, contents, generate_content_config = _recipeRequest(commonName, scientificName, edibleUses)
+  parser = IncrementalJSON()
+  text = []
+  async for chunk in generateContentStream(model=model, contents=contents, config=generate_content_config, lane="recipe"):
+    if not chunk.text:
+      continue
+    text.append(chunk.text)
+    for kind, path, value in parser.feed(chunk.text):
+      if kind == "string" and path == ("output", "recipeName"):
+        yield "recipeName", {"recipeName": value}
+      elif kind == "string" and len(path) == 3 and path[:2] == ("output", "ingredients"):
+        yield "ingredient", {"index": path[2], "ingredient": value}
+      elif kind == "partial" and path == ("output", "instructions"):
+        yield "instructions", {"delta": value}
+
+  recipe = json.loads("".join(text))
+  if validate is not None:
+    recipe = validate(recipe)
+  await recipeCache.set(key, recipe)
+  yield "recipe", recipe
@@ -1,52 +1,247 @@
+import asyncio
 import os
-from dotenv import load_dotenv
-from pymongo import MongoClient, DESCENDING
+import time
+from pymongo import DESCENDING
 
-load_dotenv()
+from database import mongo
+from utils import metrics
 
-client = MongoClient(os.getenv("MONGODB_URI"))
-db = client[os.getenv("DB_NAME")]
-plants = db[os.getenv("COLL_NAME")]
+TOP_K = 3
+SNAPSHOT_ENABLED = os.getenv("PLANT_SNAPSHOT", "1") == "1"
+SNAPSHOT_REFRESH_SECONDS = float(os.getenv("PLANT_SNAPSHOT_REFRESH_SECONDS", "3600"))
+SNAPSHOT_WATCH = os.getenv("PLANT_SNAPSHOT_WATCH", "0") == "1"
+# A re-ingest is thousands of upserts; reload once the stream has been quiet
+# this long, and at least every SNAPSHOT_WATCH_MAX_WAIT during a long load.
+SNAPSHOT_WATCH_QUIET_SECONDS = float(os.getenv("PLANT_SNAPSHOT_WATCH_QUIET_SECONDS", "2"))
+SNAPSHOT_WATCH_MAX_WAIT = float(os.getenv("PLANT_SNAPSHOT_WATCH_MAX_WAIT", "30"))
+# "batched" answers every symptom with one aggregation, "per-symptom" issues
+# one find() per condition, concurrently. Only used when no snapshot is loaded.
+QUERY_MODE = os.getenv("PLANT_QUERY_MODE", "batched")
+FANOUT_CONCURRENCY = int(os.getenv("PLANT_FANOUT_CONCURRENCY", "8"))
+SYMPTOM_TIMEOUT_SECONDS = float(os.getenv("PLANT_SYMPTOM_TIMEOUT_SECONDS", "2"))
+
+# is_safe and image_urls are written by database/ingest.py.
+SAFE_QUERY = {"is_safe": True}
+PROJECTION = {
+    "use_keyword": 1,
+    "common_name_search": 1,
+    "latin_name_search": 1,
+    "medicinal_rating_search": 1,
+    "edibility_rating_search": 1,
+    "Edible Uses": 1,
+    "image_urls": 1,
+    "plant_url": 1,
+}
+
+# {edible: {use_keyword: [PlantInfo dict, ...]}}, swapped atomically on refresh.
+# None means no snapshot yet, so bestPlant falls back to querying Mongo.
+_snapshot: dict[bool, dict[str, list[dict]]] | None = None
+_tasks: list[asyncio.Task] = []
 
-def bestPlant(classDict: dict[str, str], edible: bool = False) -> dict[str, list[dict]]:
-    recommendations: dict[str, list[dict]] = {}
 
+def _sortKeys(edible: bool) -> tuple[str, str]:
     primary   = "edibility_rating_search"   if edible else "medicinal_rating_search"
     secondary = "medicinal_rating_search"   if edible else "edibility_rating_search"
+    return primary, secondary
 
-    for symptom, condition in classDict.items():
-        query = {
-            "use_keyword": condition,
-            "Known Hazards": "None known"
+
+def _rating(value) -> float:
+    # Mongo sorts missing/null/NaN below every number; mirror that.
+    if isinstance(value, (int, float)) and value == value:
+        return float(value)
+    return float("-inf")
+
+
+def _toPlantInfo(doc: dict) -> dict:
+    return {
+        "plantName":      str(doc.get("common_name_search", "")),
+        "scientificName": str(doc.get("latin_name_search", "")),
+        "medicalRating":  _intRating(doc.get("medicinal_rating_search")),
+        "edibleRating":   _intRating(doc.get("edibility_rating_search")),
+        "edibleUses":     str(doc.get("Edible Uses", "")),
+        "plantImageURL":  doc.get("image_urls") or [],
+        "plantURL":       str(doc.get("plant_url", ""))
+    }
+
+
+def _intRating(value) -> int:
+    rating = _rating(value)
+    return int(rating) if rating != float("-inf") else 0
+
+
+def _buildSnapshot(byKeyword: dict[str, list[dict]]) -> dict[bool, dict[str, list[dict]]]:
+    snapshot: dict[bool, dict[str, list[dict]]] = {}
+    for edible in (False, True):
+        primary, secondary = _sortKeys(edible)
+        snapshot[edible] = {
+            keyword: [
+                _toPlantInfo(doc)
+                for doc in sorted(
+                    docs,
+                    key=lambda d: (_rating(d.get(primary)), _rating(d.get(secondary))),
+                    reverse=True
+                )[:TOP_K]
+            ]
+            for keyword, docs in byKeyword.items()
         }
+    return snapshot
+
+
+async def loadSnapshot():
+    global _snapshot
+    start = time.perf_counter()
+    byKeyword: dict[str, list[dict]] = {}
+    async for doc in mongo.plants().find(SAFE_QUERY, PROJECTION):
+        keywords = doc.get("use_keyword")
+        if not isinstance(keywords, list):
+            keywords = [keywords]
+        for keyword in keywords:
+            if isinstance(keyword, str):
+                byKeyword.setdefault(keyword, []).append(doc)
+
+    # Sorting the whole catalog is pure CPU; keep it off the event loop.
+    _snapshot = await asyncio.to_thread(_buildSnapshot, byKeyword)
+    print(f"Plant snapshot loaded: {len(byKeyword)} use keywords in {time.perf_counter() - start:.2f}s")
+
+
+async def _refreshLoop():
+    while True:
+        await asyncio.sleep(SNAPSHOT_REFRESH_SECONDS)
+        try:
+            await loadSnapshot()
+        except Exception as e:
+            print(f"Plant snapshot refresh failed, keeping previous snapshot: {e}")
+
+
+async def _watchChanges():
+    # Change streams need a replica set (Atlas always is); reload on any write.
+    loop = asyncio.get_running_loop()
+    try:
+        async with await mongo.plants().watch(max_await_time_ms=200) as stream:
+            async for _ in stream:
+                # Swallow the rest of the burst before paying for one reload.
+                first = last = loop.time()
+                while loop.time() - last < SNAPSHOT_WATCH_QUIET_SECONDS and loop.time() - first < SNAPSHOT_WATCH_MAX_WAIT:
+                    if await stream.try_next() is not None:
+                        last = loop.time()
+                await loadSnapshot()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"Plant change stream stopped: {e}")
+
+
+async def startSnapshot():
+    if not SNAPSHOT_ENABLED:
+        return
+    try:
+        await loadSnapshot()
+    except Exception as e:
+        print(f"Plant snapshot unavailable, using Mongo queries: {e}")
+    _tasks.append(asyncio.create_task(_refreshLoop()))
+    if SNAPSHOT_WATCH:
+        _tasks.append(asyncio.create_task(_watchChanges()))
 
-        sort_criteria = [
-            (primary,   DESCENDING),
-            (secondary, DESCENDING)
-        ]
 
-        cursor = plants.find(query).sort(sort_criteria).limit(3)
-        topPlants: list[dict] = []
-
-        for doc in cursor:
-            raw_images = doc.get("Image URLs", "")
-            if isinstance(raw_images, str):
-                imageURLs = [u.strip() for u in raw_images.split(";") if u.strip()]
-            elif isinstance(raw_images, list):
-                imageURLs = raw_images
-            else:
-                imageURLs = []
-
-            topPlants.append({
-                "plantName":      str(doc.get("common_name_search", "")),
-                "scientificName": str(doc.get("latin_name_search", "")),
-                "medicalRating":  int(doc.get("medicinal_rating_search") or 0),
-                "edibleRating":   int(doc.get("edibility_rating_search") or 0),
-                "edibleUses":     str(doc.get("Edible Uses", "")),
-                "plantImageURL":  imageURLs,
-                "plantURL":       str(doc.get("plant_url", ""))
-            })
-
-        recommendations[symptom] = topPlants
+async def stopSnapshot():
+    for task in _tasks:
+        task.cancel()
+    _tasks.clear()
+
+
+async def fanOut(keys: list, fn, default, limit: int = FANOUT_CONCURRENCY, timeout: float = SYMPTOM_TIMEOUT_SECONDS) -> dict:
+    # Runs fn(key) for every key, at most `limit` at once. A key that takes
+    # longer than `timeout` gets `default` instead of holding up the others,
+    # so the total is bounded by the slowest key, not the sum. Results keep
+    # the order of `keys`.
+    sem = asyncio.Semaphore(limit)
+
+    async def one(key):
+        async with sem:
+            try:
+                return await asyncio.wait_for(fn(key), timeout)
+            except asyncio.TimeoutError:
+                metrics.symptomTimeouts.inc()
+                print(f"Per-symptom lookup for {key!r} timed out after {timeout}s; returning partial results")
+                return default
+
+    results = await asyncio.gather(*(one(key) for key in keys))
+    return dict(zip(keys, results))
+
+
+async def _findTop(condition: str, edible: bool) -> list[dict]:
+    primary, secondary = _sortKeys(edible)
+    query = {
+        "use_keyword": condition,
+        **SAFE_QUERY
+    }
+
+    sort_criteria = [
+        (primary,   DESCENDING),
+        (secondary, DESCENDING)
+    ]
+
+    cursor = mongo.plants().find(query, PROJECTION).sort(sort_criteria).limit(TOP_K)
+    return [_toPlantInfo(doc) async for doc in cursor]
+
+
+async def bestPlant(classDict: dict[str, str], edible: bool = False) -> dict[str, list[dict]]:
+    recommendations: dict[str, list[dict]] = {}
+
+    snapshot = _snapshot
+    if snapshot is not None:
+        index = snapshot[edible]
+        for symptom, condition in classDict.items():
+            recommendations[symptom] = list(index.get(condition, []))
+        return recommendations
+
+    if QUERY_MODE == "batched":
+        # One aggregate answers every symptom, so a slow one would hold up the
+        # whole request; past the per-symptom budget they all get no plants.
+        try:
+            return await asyncio.wait_for(_batchedQuery(classDict, edible), SYMPTOM_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            metrics.symptomTimeouts.inc(len(classDict))
+            print(f"Batched plant lookup for {list(classDict)} timed out after {SYMPTOM_TIMEOUT_SECONDS}s; returning no plants")
+            return {symptom: [] for symptom in classDict}
+
+    # Several symptoms often map to the same condition; look each up once.
+    conditions = list(dict.fromkeys(classDict.values()))
+    byCondition = await fanOut(conditions, lambda condition: _findTop(condition, edible), default=[])
+    for symptom, condition in classDict.items():
+        recommendations[symptom] = list(byCondition[condition])
 
     return recommendations
+
+
+async def _batchedQuery(classDict: dict[str, str], edible: bool) -> dict[str, list[dict]]:
+    # Several symptoms often map to the same condition; query each once.
+    conditions = list(dict.fromkeys(classDict.values()))
+    if not conditions:
+        return {}
+
+    primary, secondary = _sortKeys(edible)
+    # Facet names are positional because labels may contain characters
+    # $facet does not accept as field names.
+    facets = {
+        f"c{i}": [
+            {"$match": {"use_keyword": condition}},
+            {"$sort": {primary: DESCENDING, secondary: DESCENDING}},
+            {"$limit": TOP_K},
+            {"$project": {"use_keyword": 0}},
+        ]
+        for i, condition in enumerate(conditions)
+    }
+    cursor = await mongo.plants().aggregate([
+        {"$match": {"use_keyword": {"$in": conditions}, **SAFE_QUERY}},
+        {"$project": PROJECTION},
+        {"$facet": facets},
+    ], maxTimeMS=int(SYMPTOM_TIMEOUT_SECONDS * 1000))
+    results = await cursor.to_list()
+    result = results[0] if results else {}
+
+    byCondition = {
+        condition: [_toPlantInfo(doc) for doc in result.get(f"c{i}", [])]
+        for i, condition in enumerate(conditions)
+    }
+    return {symptom: list(byCondition[condition]) for symptom, condition in classDict.items()}
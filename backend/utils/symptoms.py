@@ -1,18 +1,43 @@
-from google import genai
 from google.genai import types
 import json
 import os
-from dotenv import load_dotenv
+import re
 
-load_dotenv()
+from utils.vertex import generateContent
+from utils.cache import TieredCache, makeKey
 
-def extract(condition: str = "") -> dict:
-  client = genai.Client(
-      vertexai=True,
-      project = os.environ.get("PROJECT"),
-      location="global",
-  )
+# Bump whenever the prompt, generation config or canonicalConcern changes.
+PROMPT_VERSION = "2"
 
+extractCache = TieredCache(
+    "extract_cache",
+    maxsize=int(os.getenv("QUERY_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("QUERY_CACHE_TTL", str(30 * 24 * 3600)))
+)
+
+_FILLER = re.compile(r"\b(?:i|im|ive|have|has|had|got|get|am|having|feel|feeling|a|an|the|my|some|really|very|kind of|little)\b")
+
+def canonicalConcern(condition: str) -> str:
+  # "I have a headache", "headache!!" and "i have headache" all map to "headache".
+  text = re.sub(r"[^a-z0-9 ]+", " ", condition.lower().replace("'", ""))
+  # Nothing but filler ("I feel it"): key on the whole text rather than let
+  # every such concern share the empty key.
+  return " ".join(_FILLER.sub(" ", text).split()) or " ".join(text.split())
+
+def cacheKey(condition: str) -> str:
+  return makeKey(PROMPT_VERSION, canonicalConcern(condition))
+
+async def extract(condition: str = "") -> dict:
+  key = cacheKey(condition)
+  cached = await extractCache.get(key)
+  if cached is not None:
+    return cached
+
+  result = await _extractWithLLM(condition)
+  await extractCache.set(key, result)
+  return result
+
+async def _extractWithLLM(condition: str) -> dict:
   si_text1 = """You are a focused symptom extractor. A user will describe how they feel using natural language. Your task is to:
 
 1. Identify each distinct symptom they mention.
@@ -64,10 +89,11 @@ Do not output anything except the JSON object.
         system_instruction=[types.Part.from_text(text=si_text1)],
     )
 
-  response = client.models.generate_content(
+  response = await generateContent(
         model="gemini-2.0-flash-lite-001",
         contents=contents,
-        config=generate_content_config
+        config=generate_content_config,
+        lane="extract"
     )
 
   return json.loads(response.text)
\ No newline at end of file
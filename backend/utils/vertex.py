@@ -0,0 +1,98 @@
+import asyncio
+import os
+import time
+
+import httpx
+from dotenv import load_dotenv
+from google import genai
+from google.genai import types
+
+from utils import metrics
+
+load_dotenv()
+
+# One long-lived client per process. Every helper borrows it instead of
+# building a fresh genai.Client (and a fresh connection pool) per call.
+_client: genai.Client | None = None
+_limits: dict[str, asyncio.Semaphore] = {}
+
+MAX_CONCURRENCY = int(os.getenv("VERTEX_MAX_CONCURRENCY", "32"))
+MAX_CONNECTIONS = int(os.getenv("VERTEX_MAX_CONNECTIONS", "64"))
+TIMEOUT_MS = int(os.getenv("VERTEX_TIMEOUT_MS", "60000"))
+
+
+def startClient() -> genai.Client:
+  global _client
+  if _client is None:
+    _client = genai.Client(
+        vertexai=True,
+        project=os.environ.get("PROJECT"),
+        location="global",
+        http_options=types.HttpOptions(
+            timeout=TIMEOUT_MS,
+            async_client_args={
+                "limits": httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_CONNECTIONS,
+                )
+            },
+        ),
+    )
+  return _client
+
+
+async def closeClient():
+  global _client
+  if _client is not None:
+    await _client.aio.aclose()
+    _client = None
+
+
+def _limiter(lane: str) -> asyncio.Semaphore:
+  # Each helper gets its own lane so a burst of recipe generations cannot
+  # starve the recommendation pipeline. VERTEX_<LANE>_CONCURRENCY overrides
+  # the shared default.
+  sem = _limits.get(lane)
+  if sem is None:
+    size = int(os.getenv(f"VERTEX_{lane.upper()}_CONCURRENCY", str(MAX_CONCURRENCY)))
+    sem = _limits[lane] = asyncio.Semaphore(size)
+  return sem
+
+
+async def generateContent(model: str, contents, config: types.GenerateContentConfig, lane: str = "default"):
+  client = startClient()
+  async with _limiter(lane):
+    start = time.perf_counter()
+    response = None
+    try:
+      response = await client.aio.models.generate_content(
+          model=model,
+          contents=contents,
+          config=config
+      )
+      return response
+    finally:
+      metrics.observeVertex(model, lane, time.perf_counter() - start, response)
+
+
+async def generateContentStream(model: str, contents, config: types.GenerateContentConfig, lane: str = "default"):
+  # Yields response chunks as Gemini produces them. The lane slot is held
+  # until the stream is exhausted or the caller stops reading.
+  client = startClient()
+  async with _limiter(lane):
+    start = time.perf_counter()
+    last = None
+    completed = False
+    try:
+      stream = await client.aio.models.generate_content_stream(
+          model=model,
+          contents=contents,
+          config=config
+      )
+      async for chunk in stream:
+        last = chunk
+        yield chunk
+      completed = True
+    finally:
+      # The last chunk carries the usage totals for the whole response.
+      metrics.observeVertex(model, lane, time.perf_counter() - start, last if completed else None)